@@ -0,0 +1,461 @@
+"""
+Benchmarks the generator on synthetic Gramps trees.
+
+Builds SQLite Gramps databases of the requested sizes (cached, so they are
+only built once), runs a full headless extraction and export on each in a
+fresh process, and appends one JSON line per run to a results file, so runs
+can be compared across commits.
+
+usage: uv run benchmark.py <path to gramps source> [--sizes 1000 100000]
+"""
+import sys
+import os
+import json
+import time
+import random
+import resource
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+# Puts Gramps on sys.path from sys.argv[1], like running onthisday.py does
+from onthisday import ThisDayInFamilyHistoryGenerator
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+FIRST_NAMES = {
+	'male': [
+		'Johann', 'Wilhelm', 'Friedrich', 'Karl', 'Heinrich', 'John',
+		'William', 'James', 'Thomas', 'George', 'Pierre', 'Jean', 'Louis',
+		'Jan', 'Pieter', 'Giovanni', 'José', 'Erik', 'Olaf', 'Samuel',
+	],
+	'female': [
+		'Maria', 'Anna', 'Elisabeth', 'Catharina', 'Margaretha', 'Mary',
+		'Sarah', 'Elizabeth', 'Jane', 'Marie', 'Jeanne', 'Louise', 'Johanna',
+		'Grietje', 'Giulia', 'Carmen', 'Ingrid', 'Kirsten', 'Rachel', 'Ada',
+	],
+}
+SURNAMES = [
+	'Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Smith', 'Jones',
+	'Taylor', 'Brown', 'Wilson', 'Martin', 'Bernard', 'Dubois', 'Jansen',
+	'Visser', 'Rossi', 'Russo', 'García', 'Fernández', 'Andersson',
+	'Johansson', 'Nowak', 'Kowalski', 'Novák', 'Horváth', 'Cohen',
+]
+SURNAME_PREFIXES = ['van', 'van der', 'de', 'von', 'di']
+PLACE_NAMES = [
+	'Springfield', 'Neustadt', 'Saint-Martin', 'Oakham', 'Bergen',
+	'Kirchberg', 'Greenville', 'Villafranca', 'Newport', 'Hamilton',
+	'Rosenthal', 'Fairview', 'Lindau', 'Marston', 'Aldeia Nova',
+]
+
+
+def _make_date(rng, year):
+	"""
+	A date around the given year with a realistic mix of calendars and
+	precision: mostly full Gregorian dates, some partial, approximate,
+	ranged or free-text ones, and Julian, Hebrew and French Republican
+	dates where they were in use.
+	"""
+	from gramps.gen.lib import Date
+	from gramps.gen.errors import DateError
+
+	date = Date()
+	roll = rng.random()
+	if roll < 0.02:
+		date.set_as_text("abt. the time of the war")
+		return date
+
+	calendar = Date.CAL_GREGORIAN
+	month = rng.randint(1, 12)
+	if 1793 <= year <= 1805 and rng.random() < 0.3:
+		calendar, year = Date.CAL_FRENCH, year - 1791
+	elif year < 1752 and rng.random() < 0.2:
+		calendar = Date.CAL_JULIAN
+	elif rng.random() < 0.01:
+		calendar, year, month = Date.CAL_HEBREW, year + 3760, rng.randint(1, 13)
+	day = rng.randint(1, 28)
+
+	if roll < 0.10:
+		modifier, value = Date.MOD_NONE, (0, 0, year, False)
+	elif roll < 0.20:
+		modifier, value = Date.MOD_NONE, (0, month, year, False)
+	elif roll < 0.23:
+		modifier = rng.choice([Date.MOD_ABOUT, Date.MOD_BEFORE, Date.MOD_AFTER])
+		value = (day, month, year, False)
+	elif roll < 0.25:
+		modifier = rng.choice([Date.MOD_RANGE, Date.MOD_SPAN])
+		value = (day, month, year, False, day, month, year + 1, False)
+	else:
+		modifier, value = Date.MOD_NONE, (day, month, year, False)
+	try:
+		date.set(Date.QUAL_NONE, modifier, calendar, value)
+	except DateError:
+		date = Date(1800, min(month, 12), day)
+	return date
+
+
+def _add_event(db, trans, rng, event_type, year, places, holder):
+	from gramps.gen.lib import Event, EventRef
+
+	event = Event()
+	event.set_type(event_type)
+	event.set_date_object(_make_date(rng, year))
+	if rng.random() < 0.85:
+		event.set_place_handle(rng.choice(places))
+	db.add_event(event, trans)
+	ref = EventRef()
+	ref.set_reference_handle(event.handle)
+	holder.add_event_ref(ref)
+
+
+def _person_events(rng, birth_year):
+	"""(event type, year) pairs for one person."""
+	from gramps.gen.lib import EventType
+
+	events = []
+	if rng.random() < 0.9:
+		events.append((EventType.BIRTH, birth_year))
+	if rng.random() < 0.3:
+		events.append((EventType.BAPTISM, birth_year))
+	for _census in range(rng.choice([0, 0, 1, 2, 3])):
+		events.append((EventType.CENSUS, birth_year + rng.randint(1, 60)))
+	for _residence in range(rng.choice([0, 1, 1, 2])):
+		events.append((EventType.RESIDENCE, birth_year + rng.randint(18, 60)))
+	for event_type, chance in (
+		(EventType.OCCUPATION, 0.4), (EventType.EMIGRATION, 0.03),
+		(EventType.IMMIGRATION, 0.03), (EventType.MILITARY_SERV, 0.05),
+		(EventType.GRADUATION, 0.05),
+	):
+		if rng.random() < chance:
+			events.append((event_type, birth_year + rng.randint(16, 40)))
+	if rng.random() < 0.01:
+		events.append(
+			(EventType((EventType.CUSTOM, 'Knighted')), birth_year + 40)
+		)
+	# Most people born long ago have a recorded death
+	if rng.random() < (0.85 if birth_year < 1930 else 0.2):
+		death_year = birth_year + rng.randint(0, 95)
+		events.append((EventType.DEATH, death_year))
+		if rng.random() < 0.5:
+			events.append((EventType.BURIAL, death_year))
+		elif rng.random() < 0.1:
+			events.append((EventType.CREMATION, death_year))
+		if rng.random() < 0.05:
+			events.append((EventType.PROBATE, death_year + 1))
+	return events
+
+
+def _family_events(rng, year):
+	from gramps.gen.lib import EventType
+
+	events = []
+	for event_type, chance in (
+		(EventType.ENGAGEMENT, 0.1), (EventType.MARR_BANNS, 0.1),
+		(EventType.MARRIAGE, 0.8), (EventType.RESIDENCE, 0.3),
+		(EventType.DIVORCE, 0.05),
+	):
+		if rng.random() < chance:
+			events.append((event_type, year))
+	return events
+
+
+def _make_person(rng, gender):
+	from gramps.gen.lib import Person, Name, Surname
+	from gramps.gen.utils.id import create_id
+
+	person = Person()
+	person.set_handle(create_id())
+	person.set_gender(gender)
+	name = Name()
+	key = 'female' if gender == Person.FEMALE else 'male'
+	name.set_first_name(rng.choice(FIRST_NAMES[key]))
+	surname = Surname()
+	surname.set_surname(rng.choice(SURNAMES))
+	if rng.random() < 0.05:
+		surname.set_prefix(rng.choice(SURNAME_PREFIXES))
+	name.add_surname(surname)
+	if rng.random() < 0.03:
+		surname.set_connector('y')
+		second = Surname()
+		second.set_surname(rng.choice(SURNAMES))
+		second.set_primary(False)
+		name.add_surname(second)
+	person.set_primary_name(name)
+	return person
+
+
+def make_synthetic_tree(db_path, people, seed=1, batch=5000):
+	"""
+	Writes a synthetic SQLite Gramps database with roughly the given number
+	of people, about one family per three people, 20 people per place and
+	a mix of event types, dates, calendars and missing data. Returns the
+	object counts.
+	"""
+	from gramps.gen.db import DbTxn
+	from gramps.gen.db.dbconst import DBBACKEND
+	from gramps.gen.lib import Person, Family, FamilyRelType, Place, PlaceName
+	from gramps.plugins.db.dbapi.sqlite import SQLite
+
+	rng = random.Random(seed)
+	os.makedirs(db_path)
+	with open(os.path.join(db_path, DBBACKEND), 'w', encoding='utf-8') as f:
+		f.write('sqlite\n')
+	with open(os.path.join(db_path, 'name.txt'), 'w', encoding='utf-8') as f:
+		f.write(f'Synthetic tree, {people} people\n')
+
+	db = SQLite()
+	db.load(db_path)
+	counts = {'people': 0, 'families': 0, 'events': 0, 'places': 0}
+	with DbTxn("Synthetic places", db) as trans:
+		places = []
+		for index in range(max(20, people // 20)):
+			place = Place()
+			place_name = PlaceName()
+			place_name.set_value(f"{rng.choice(PLACE_NAMES)} {index}")
+			place.set_name(place_name)
+			db.add_place(place, trans)
+			places.append(place.handle)
+	counts['places'] = len(places)
+
+	relationships = (
+		[FamilyRelType.MARRIED] * 80 + [FamilyRelType.UNMARRIED] * 7
+		+ [FamilyRelType.CIVIL_UNION] * 3 + [FamilyRelType.UNKNOWN] * 10
+	)
+	created = 0
+	while created < people:
+		size = min(batch, people - created)
+		with DbTxn("Synthetic people", db) as trans:
+			# Couples are made of neighbours in the batch, so every
+			# reference points at a person written in the same batch
+			members = [
+				_make_person(rng, rng.choice([Person.MALE, Person.FEMALE]))
+				if rng.random() < 0.98 else _make_person(rng, Person.UNKNOWN)
+				for _index in range(size)
+			]
+			birth_years = [rng.randint(1600, 2000) for _person in members]
+			for index in range(0, size - 1, 3):
+				family = Family()
+				father, mother = members[index], members[index + 1]
+				if rng.random() < 0.05:
+					father = None
+				elif rng.random() < 0.05:
+					mother = None
+				if father:
+					family.set_father_handle(father.handle)
+				if mother:
+					family.set_mother_handle(mother.handle)
+				family.set_relationship(FamilyRelType(rng.choice(relationships)))
+				year = birth_years[index] + rng.randint(18, 35)
+				for event_type, year in _family_events(rng, year):
+					_add_event(db, trans, rng, event_type, year, places, family)
+					counts['events'] += 1
+				db.add_family(family, trans)
+				counts['families'] += 1
+				for partner in (father, mother):
+					if partner:
+						partner.add_family_handle(family.handle)
+			for person, birth_year in zip(members, birth_years):
+				for event_type, year in _person_events(rng, birth_year):
+					_add_event(db, trans, rng, event_type, year, places, person)
+					counts['events'] += 1
+				db.add_person(person, trans)
+		created += size
+		counts['people'] = created
+		print(f"  {created}/{people} people written.")
+	db.close()
+	return counts
+
+
+def synthetic_tree(cache_dir, people, seed):
+	"""
+	Returns the path and object counts of a cached synthetic tree, building
+	it first if needed.
+	"""
+	db_path = os.path.join(cache_dir, f"synthetic_{people}_{seed}")
+	info_path = os.path.join(db_path, 'benchmark.json')
+	if os.path.exists(info_path):
+		with open(info_path, encoding='utf-8') as f:
+			return db_path, json.load(f)
+
+	print(f"Building a synthetic tree of {people} people in {db_path}...")
+	shutil.rmtree(db_path, ignore_errors=True)
+	started = time.perf_counter()
+	counts = make_synthetic_tree(db_path, people, seed)
+	counts['seed'] = seed
+	counts['build_seconds'] = round(time.perf_counter() - started, 3)
+	# Written last, so a half-built tree is rebuilt next time
+	with open(info_path, 'w', encoding='utf-8') as f:
+		json.dump(counts, f, indent=2)
+	return db_path, counts
+
+
+def peak_rss_kb():
+	"""
+	Peak resident set size of this process and its finished workers, in KiB.
+	ru_maxrss survives exec on Linux, so it would include the parent that
+	started us; VmHWM belongs to this process image only.
+	"""
+	children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+	try:
+		with open('/proc/self/status', encoding='ascii') as f:
+			for line in f:
+				if line.startswith('VmHWM:'):
+					return max(int(line.split()[1]), children)
+	except OSError:
+		pass
+	return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, children)
+
+
+def run_once(db_path, backend, workers, stream, result_path):
+	"""Child side: one full headless run, with timings to result_path."""
+	output_dir = tempfile.mkdtemp(prefix='onthisday-bench-')
+	try:
+		generator = ThisDayInFamilyHistoryGenerator(
+			db_path, backend=backend, headless=True
+		)
+		generator.run(output_dir, full=True, workers=workers, stream=stream)
+		files = [
+			os.path.join(output_dir, name) for name in os.listdir(output_dir)
+		]
+		result = {
+			'phases': {
+				phase: round(seconds, 4)
+				for phase, seconds in generator.timings.items()
+			},
+			'deceased': len(generator.deceased_person_handles),
+			'records': generator.record_count(),
+			'files': len(files),
+			'output_bytes': sum(os.path.getsize(path) for path in files),
+			'peak_rss_kb': peak_rss_kb(),
+		}
+	finally:
+		shutil.rmtree(output_dir, ignore_errors=True)
+	with open(result_path, 'w', encoding='utf-8') as f:
+		json.dump(result, f)
+
+
+def measure(db_path, backend, workers, stream=False):
+	"""
+	Runs run_once in a fresh interpreter and returns its result with the
+	wall time of the whole process, interpreter startup included, added.
+	"""
+	fd, result_path = tempfile.mkstemp(suffix='.json')
+	os.close(fd)
+	command = [
+		sys.executable, os.path.abspath(__file__), sys.argv[1],
+		'--run-once', db_path, '--backend', backend,
+		'--workers', str(workers), '--result-file', result_path,
+	] + (['--stream'] if stream else [])
+	try:
+		started = time.perf_counter()
+		subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+		wall = time.perf_counter() - started
+		with open(result_path, encoding='utf-8') as f:
+			result = json.load(f)
+	finally:
+		os.remove(result_path)
+	result['wall_seconds'] = round(wall, 4)
+	return result
+
+
+def current_commit():
+	try:
+		return subprocess.run(
+			['git', 'rev-parse', '--short', 'HEAD'], cwd=script_dir,
+			capture_output=True, text=True, check=True,
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description="Benchmark the generator on synthetic Gramps trees."
+	)
+	parser.add_argument('gramps_path', help="path to the Gramps source tree")
+	parser.add_argument(
+		'--sizes', type=int, nargs='+', default=[1000, 10000],
+		help="tree sizes in people (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--backend', action='append', choices=['objects', 'raw', 'sql'],
+		help="backend to run; repeat for several (default: objects and raw)",
+	)
+	parser.add_argument(
+		'--workers', type=int, nargs='+', default=[1],
+		help="worker counts to run (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--stream', action='store_true',
+		help="benchmark streaming runs, which spill records to disk",
+	)
+	parser.add_argument(
+		'--repeat', type=int, default=1,
+		help="runs per configuration (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--seed', type=int, default=1,
+		help="seed for the synthetic trees (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--cache-dir', default=os.path.join(script_dir, 'benchmark_dbs'),
+		help="where synthetic trees are kept between runs "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--results', default=os.path.join(script_dir, 'benchmark_results.jsonl'),
+		help="JSON lines file the results are appended to "
+		"(default: %(default)s)",
+	)
+	parser.add_argument('--run-once', metavar='DB_PATH', help=argparse.SUPPRESS)
+	parser.add_argument('--result-file', help=argparse.SUPPRESS)
+	args = parser.parse_args()
+
+	if args.run_once:
+		run_once(
+			args.run_once, args.backend[0], args.workers[0], args.stream,
+			args.result_file,
+		)
+		return
+
+	backends = args.backend or ['objects', 'raw']
+	environment = {
+		'commit': current_commit(),
+		'python': platform.python_version(),
+		'machine': platform.machine(),
+		'cpus': os.cpu_count(),
+	}
+	os.makedirs(args.cache_dir, exist_ok=True)
+	print(f"{'people':>9} {'backend':>8} {'workers':>7} {'wall s':>8} {'peak MB':>8}")
+	for size in args.sizes:
+		db_path, tree = synthetic_tree(args.cache_dir, size, args.seed)
+		for backend in backends:
+			for workers in args.workers:
+				for repeat in range(args.repeat):
+					result = measure(db_path, backend, workers, args.stream)
+					record = {
+						'timestamp': datetime.now(timezone.utc).isoformat(),
+						**environment,
+						'tree': tree,
+						'backend': backend,
+						'workers': workers,
+						'stream': args.stream,
+						'repeat': repeat,
+						**result,
+					}
+					with open(args.results, 'a', encoding='utf-8') as f:
+						f.write(json.dumps(record) + '\n')
+					print(
+						f"{size:>9} {backend:>8} {workers:>7} "
+						f"{result['wall_seconds']:>8.2f} "
+						f"{result['peak_rss_kb'] / 1024:>8.1f}"
+					)
+	print(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+	main()
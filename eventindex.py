@@ -0,0 +1,127 @@
+"""
+Reads and writes events.idx, every day's events in one file.
+
+The file is a header, a table with the offset and length of each of the
+366 days of a leap year in calendar order, and then each day's records as
+minified UTF-8 JSON, the same list as in events_MM_DD.json:
+
+    b'TDFH'  version (u16)  day count (u16)
+    offset (u64)  length (u64)          x 366, relative to the file start
+    day payloads
+
+All numbers are little-endian. A day without events has length 0.
+
+EventIndex memory-maps the file, so looking up a day is two table reads
+and a slice; only the days asked for are ever parsed. onthisday.py writes
+the file with `--layout index` and replaces it by renaming, so an open
+reader keeps seeing the version it opened.
+
+This only reads the index file; it does not need Gramps.
+"""
+import json
+import mmap
+import struct
+from datetime import date, timedelta
+
+
+MAGIC = b'TDFH'
+VERSION = 1
+_HEADER = struct.Struct('<4sHH')
+_ENTRY = struct.Struct('<QQ')
+
+# Every (month, day) of a leap year, in calendar order
+DAYS = [
+	(day.month, day.day)
+	for day in (date(2000, 1, 1) + timedelta(days=offset) for offset in range(366))
+]
+DAY_POSITIONS = {day: position for position, day in enumerate(DAYS)}
+
+
+def pack_index(payloads):
+	"""
+	Builds the bytes of an index file from a dict of (month, day) -> the
+	day's records as JSON bytes. Days that are missing have no events.
+	"""
+	table_end = _HEADER.size + _ENTRY.size * len(DAYS)
+	table = []
+	data = []
+	offset = table_end
+	for day in DAYS:
+		payload = payloads.get(day, b'')
+		table.append(_ENTRY.pack(offset if payload else 0, len(payload)))
+		data.append(payload)
+		offset += len(payload)
+	return b''.join(
+		[_HEADER.pack(MAGIC, VERSION, len(DAYS))] + table + data
+	)
+
+
+class EventIndex:
+	"""
+	A memory-mapped events.idx. Use as a context manager or call close().
+
+	    with EventIndex('daily_events/events.idx') as index:
+	        index.day(12, 25)                 # list of records
+	        index.raw(12, 25)                 # the JSON bytes, unparsed
+	        for (month, day), records in index.days((12, 28), (1, 3)):
+	            ...
+	"""
+
+	def __init__(self, path):
+		with open(path, 'rb') as f:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		table_end = _HEADER.size + _ENTRY.size * len(DAYS)
+		if len(self._map) < table_end:
+			self.close()
+			raise ValueError(f"{path} is truncated")
+		magic, version, count = _HEADER.unpack_from(self._map)
+		if magic != MAGIC or count != len(DAYS):
+			self.close()
+			raise ValueError(f"{path} is not an events index")
+		if version != VERSION:
+			self.close()
+			raise ValueError(
+				f"{path} is index version {version}, this reader knows {VERSION}"
+			)
+
+	def close(self):
+		self._map.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def raw(self, month, day):
+		"""The JSON bytes of a day's records, or b'' if it has none."""
+		position = DAY_POSITIONS.get((month, day))
+		if position is None:
+			raise ValueError(f"no such day: {month:02d}-{day:02d}")
+		offset, length = _ENTRY.unpack_from(
+			self._map, _HEADER.size + _ENTRY.size * position
+		)
+		if offset + length > len(self._map):
+			raise ValueError(f"the index is truncated at {month:02d}-{day:02d}")
+		return self._map[offset:offset + length]
+
+	def day(self, month, day):
+		"""A day's records, as in events_MM_DD.json; [] if it has none."""
+		payload = self.raw(month, day)
+		return json.loads(payload) if payload else []
+
+	def days(self, start, end):
+		"""
+		Yields ((month, day), records) for every day with events from start
+		to end inclusive, both (month, day), wrapping over the new year if
+		end is before start.
+		"""
+		first, last = DAY_POSITIONS[start], DAY_POSITIONS[end]
+		if last >= first:
+			span = DAYS[first:last + 1]
+		else:
+			span = DAYS[first:] + DAYS[:last + 1]
+		for month, day in span:
+			payload = self.raw(month, day)
+			if payload:
+				yield (month, day), json.loads(payload)
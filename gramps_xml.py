@@ -0,0 +1,455 @@
+"""
+Reads what onthisday.py needs from a Gramps XML export (.gramps, gzipped
+or not) with ElementTree's iterparse, without Gramps installed.
+
+The place names come last in the file, so they are read first, by
+scanning the bytes for the places section and parsing only that; then one
+pass reads the events, people and families, which come in that order.
+Each element is dropped as soon as it has been read. Values come out the
+way Gramps' XML importer would store them, so a tree read from its export
+gives the same output as a database the export was imported into:
+  - event types are their XML names, 'Birth' when missing
+  - dates go through the checks of Date.set() and are converted to
+    Gregorian through the same day numbers
+  - people and families come in the order the importer creates them,
+    which is the order they are first referred to
+"""
+import gzip
+import xml.etree.ElementTree as ET
+from collections import deque
+
+from calendars import CALENDAR_NAMES, TO_SDN, FROM_SDN
+
+
+class Person:
+	"""The gender values of gramps.gen.lib.Person."""
+	FEMALE, MALE, UNKNOWN, OTHER = 0, 1, 2, 3
+
+
+class FamilyRelType:
+	"""The values of gramps.gen.lib.FamilyRelType."""
+	MARRIED, UNMARRIED, CIVIL_UNION, UNKNOWN, CUSTOM = 0, 1, 2, 3, 4
+
+
+# Genders by their XML letter; anything else is unknown
+GENDERS = {'F': Person.FEMALE, 'M': Person.MALE, 'X': Person.OTHER}
+# Relationships by XML name; other names are custom types
+RELATIONSHIPS = {
+	'Married': FamilyRelType.MARRIED, 'Unmarried': FamilyRelType.UNMARRIED,
+	'Civil Union': FamilyRelType.CIVIL_UNION, 'Unknown': FamilyRelType.UNKNOWN,
+}
+# What a new Event and Family are when the file does not say
+DEFAULT_EVENT_TYPE = 'Birth'
+
+_CHUNK_SIZE = 1 << 16
+_ROOT_TAG = b'<database'
+_PLACES_TAG = b'<places'
+
+_CAL_GREGORIAN, _CAL_JULIAN, _CAL_SWEDISH = 0, 1, 6
+# Date.NEWYEAR_* codes by name, and the (month, day) each starts the year on
+_NEWYEAR_CODES = {'': 0, 'jan1': 0, 'mar1': 1, 'mar25': 2, 'sep1': 3}
+_NEWYEAR_SPLITS = {1: (3, 1), 2: (3, 25), 3: (9, 1)}
+_NO_DATE = (0, 0, 0)
+
+
+def _local(tag):
+	"""Strips the '{namespace}' ElementTree puts in front of tags."""
+	return tag.rpartition('}')[2]
+
+
+def _handle(value):
+	"""Handles are written with a leading underscore, which Gramps drops."""
+	return value.replace('_', '')
+
+
+def _iso_parts(value):
+	"""(year, month, day) of a date value like '1850-03-12' or '????-03'."""
+	sign = 1
+	if value[:1] == '-':
+		sign = -1
+		value = value[1:]
+	parts = value.split('-')
+	numbers = []
+	for position in range(3):
+		try:
+			numbers.append(int(parts[position]))
+		except (IndexError, ValueError):
+			numbers.append(0)
+	return numbers[0] * sign, numbers[1], numbers[2]
+
+
+def _newyear(value):
+	"""Date.newyear_to_code(), plus the numeric codes the importer accepts."""
+	if value.isdigit():
+		return int(value)
+	value = value.strip().lower()
+	if value in _NEWYEAR_CODES:
+		return _NEWYEAR_CODES[value]
+	if '-' in value:
+		try:
+			return tuple(map(int, value.split('-')))
+		except ValueError:
+			return 0
+	return 0
+
+
+def _zero_adjust(year, month, day):
+	return (year or 1, max(month, 1), max(day, 1))
+
+
+def event_date(element):
+	"""
+	The Gregorian (year, month, day) of a dateval, daterange or datespan
+	element, or (0, 0, 0) where Gramps would hold a text-only or empty
+	date. Follows Date.set() and Date.to_calendar('gregorian').
+	"""
+	attrs = element.attrib
+	if _local(element.tag) == 'dateval':
+		parts = [_iso_parts(attrs.get('val', ''))]
+	else:
+		parts = [_iso_parts(attrs.get('start', '')), _iso_parts(attrs.get('stop', ''))]
+	try:
+		calendar = CALENDAR_NAMES.index(attrs.get('cformat', 'Gregorian'))
+	except ValueError:
+		return _NO_DATE
+	newyear = _newyear(attrs.get('newyear', ''))
+	if newyear and calendar not in (_CAL_GREGORIAN, _CAL_JULIAN, _CAL_SWEDISH):
+		return _NO_DATE
+	# Dual dated dates are always Julian
+	if attrs.get('dualdated') == '1':
+		calendar = _CAL_JULIAN
+	to_sdn = TO_SDN[calendar]
+
+	year, month, day = parts[0]
+	if year == month == day == 0:
+		return _NO_DATE
+	sortval = to_sdn(*_zero_adjust(year, month, day))
+	year_delta = 0
+	split = newyear if isinstance(newyear, tuple) else _NEWYEAR_SPLITS.get(newyear)
+	if split and (month, day) >= split:
+		year_delta = -1
+		sortval = to_sdn(*_zero_adjust(year - 1, month, day))
+
+	# The round trip through the day number must give the date back, or
+	# Gramps keeps the date as text only
+	sdns = [sortval] + [to_sdn(*_zero_adjust(*part)) for part in parts[1:]]
+	for (year, month, day), sdn in zip(parts, sdns):
+		back_year, back_month, back_day = FROM_SDN[calendar](sdn)
+		for back, original in (
+			(back_day, day), (back_month, month), (back_year - year_delta, year),
+		):
+			if back != original and not (original == 0 and back == 1):
+				return _NO_DATE
+
+	if calendar == _CAL_GREGORIAN:
+		return parts[0]
+	return FROM_SDN[_CAL_GREGORIAN](sortval)
+
+
+def _event(element):
+	"""(handle, (event type, month, day, year, place handle)) of an event."""
+	event_type = DEFAULT_EVENT_TYPE
+	gregorian = _NO_DATE
+	place = None
+	for child in element:
+		tag = _local(child.tag)
+		if tag == 'type':
+			event_type = child.text or ''
+		elif tag in ('dateval', 'daterange', 'datespan'):
+			gregorian = event_date(child)
+		elif tag == 'datestr':
+			gregorian = _NO_DATE
+		elif tag == 'place':
+			place = _handle(child.get('hlink', ''))
+	year, month, day = gregorian
+	return _handle(element.get('handle', '')), (event_type, month, day, year, place)
+
+
+def _first_name(text):
+	# What the importer does to first names spread over several lines
+	if len(text.splitlines()) != 1:
+		return ''.join(text.splitlines())
+	return text
+
+
+def _name_parts(element):
+	"""(first name, suffix, surnames) of a name element."""
+	first_name = suffix = ''
+	surnames = []
+	for child in element:
+		tag = _local(child.tag)
+		if tag == 'first':
+			first_name = _first_name(child.text or '')
+		elif tag == 'suffix':
+			suffix = child.text or ''
+		elif tag == 'surname':
+			surnames.append({
+				'prefix': child.get('prefix', ''),
+				'surname': child.text or '',
+				'connector': child.get('connector', ''),
+			})
+	return first_name, suffix, surnames
+
+
+def _person(element):
+	"""
+	Returns the person's (handle, gramps_id, name parts, gender, event
+	handles, family handles), and the people and families it refers to.
+	"""
+	gender = Person.UNKNOWN
+	name = ('', '', [])
+	events = []
+	families = []
+	people_mentioned = []
+	families_mentioned = []
+	for child in element:
+		tag = _local(child.tag)
+		if tag == 'gender':
+			gender = GENDERS.get(child.text, Person.UNKNOWN)
+		elif tag == 'name' and not child.get('alt'):
+			name = _name_parts(child)
+		elif tag == 'eventref':
+			events.append(_handle(child.get('hlink', '')))
+		elif tag == 'parentin':
+			families.append(_handle(child.get('hlink', '')))
+			families_mentioned.append(families[-1])
+		elif tag == 'childof':
+			families_mentioned.append(_handle(child.get('hlink', '')))
+		elif tag == 'personref':
+			people_mentioned.append(_handle(child.get('hlink', '')))
+	person = (
+		_handle(element.get('handle', '')), element.get('id', ''), name, gender,
+		events, families,
+	)
+	return person, people_mentioned, families_mentioned
+
+
+def _family(element):
+	"""(handle, father, mother, relationship, event handles) of a family."""
+	father = mother = None
+	relationship_name = element.get('type')
+	events = []
+	for child in element:
+		tag = _local(child.tag)
+		if tag == 'father':
+			father = _handle(child.get('hlink', ''))
+		elif tag == 'mother':
+			mother = _handle(child.get('hlink', ''))
+		elif tag == 'rel':
+			relationship_name = child.get('type', relationship_name)
+		elif tag == 'eventref':
+			events.append(_handle(child.get('hlink', '')))
+	if relationship_name is None:
+		relationship = FamilyRelType.MARRIED
+	else:
+		relationship = RELATIONSHIPS.get(relationship_name, FamilyRelType.CUSTOM)
+	return (_handle(element.get('handle', '')), father, mother, relationship, events)
+
+
+class _FirstMentions:
+	"""
+	Puts records in the order their handles are first mentioned in the
+	file, which is the order Gramps' importer creates objects in. A record
+	read before one mentioned earlier is held until that one is read.
+	"""
+
+	def __init__(self):
+		self._queue = deque()
+		self._mentioned = set()
+		self._held = {}
+
+	def mention(self, handle):
+		if handle not in self._mentioned:
+			self._mentioned.add(handle)
+			self._queue.append(handle)
+
+	def add(self, handle, record):
+		"""Yields the records that are next in order now that this one is read."""
+		self.mention(handle)
+		self._held[handle] = record
+		while self._queue and self._queue[0] in self._held:
+			yield self._held.pop(self._queue.popleft())
+
+	def flush(self):
+		"""Yields the rest, skipping handles that were mentioned but never defined."""
+		while self._queue:
+			record = self._held.pop(self._queue.popleft(), None)
+			if record is not None:
+				yield record
+
+
+class GrampsXml:
+	"""
+	A Gramps XML export. The place names are read when it is opened; then
+	events(), people() and families() each continue one pass over the file
+	where the previous one stopped, so they have to be called in that
+	order. Events passed over on the way to the people are kept for
+	event().
+	"""
+
+	# An event that is referred to but not in the file: the importer
+	# creates an empty one
+	_MISSING_EVENT = (DEFAULT_EVENT_TYPE, 0, 0, 0, None)
+
+	def __init__(self, path):
+		self.path = path
+		self.place_names = {}
+		places = self._elements_of('places', self._elements(self._places_chunks()))
+		for element in places:
+			if _local(element.tag) == 'placeobj':
+				self.place_names[_handle(element.get('handle', ''))] = \
+					self._place_name(element)
+		self._stream = self._elements(self._chunks())
+		self._events = {}
+		# Events read so far; the file holds no count of its own
+		self.events_read = 0
+		self._family_order = _FirstMentions()
+
+	def _chunks(self):
+		with open(self.path, 'rb') as f:
+			compressed = f.read(2) == b'\x1f\x8b'
+		with gzip.open(self.path) if compressed else open(self.path, 'rb') as f:
+			yield from iter(lambda: f.read(_CHUNK_SIZE), b'')
+
+	def _places_chunks(self):
+		"""
+		The file up to the end of the root element's start tag, then from
+		the places section on. Text and attributes cannot hold a '<', so
+		the section is found without parsing everything before it.
+		"""
+		chunks = self._chunks()
+		head = b''
+		for chunk in chunks:
+			head += chunk
+			root = head.find(_ROOT_TAG)
+			end = head.find(b'>', root) if root >= 0 else -1
+			if end >= 0:
+				break
+		else:
+			return
+		yield head[:end + 1]
+		# Keep enough of each chunk to find the tag across a boundary
+		rest = head[end + 1:]
+		while True:
+			start = rest.find(_PLACES_TAG)
+			if start >= 0:
+				yield rest[start:]
+				yield from chunks
+				return
+			rest = rest[-len(_PLACES_TAG):]
+			chunk = next(chunks, b'')
+			if not chunk:
+				# No places: close the root
+				yield b'</database>'
+				return
+			rest += chunk
+
+	def _elements(self, chunks):
+		"""
+		Yields ('open', section), ('item', element) for each element in it
+		once it is complete, and ('close', section), for the top-level
+		sections of a document read from chunks of bytes. Items are
+		dropped from the tree once the caller is done with them, so memory
+		does not grow with the file.
+		"""
+		parser = ET.XMLPullParser(('start', 'end'))
+		depth = 0
+		section = None
+		for chunk in chunks:
+			parser.feed(chunk)
+			for event, element in parser.read_events():
+				if event == 'start':
+					depth += 1
+					if depth == 2:
+						section = element
+						yield 'open', section
+					continue
+				depth -= 1
+				if depth == 2:
+					yield 'item', element
+					# Also detaches elements parsed ahead, which the pending
+					# events still hold on to
+					section.clear()
+				elif depth == 1:
+					yield 'close', section
+		parser.close()
+
+	def _elements_of(self, name, stream):
+		"""
+		Yields the section element and then the items of the top-level
+		section called name from stream. Unless reading the places, events
+		passed over are kept.
+		"""
+		keep_events = name != 'places'
+		inside = False
+		for kind, element in stream:
+			if kind == 'open':
+				inside = _local(element.tag) == name
+				if inside:
+					yield element
+			elif not inside:
+				if keep_events and kind == 'item' and _local(element.tag) == 'event':
+					handle, entry = _event(element)
+					self._events[handle] = entry
+					self.events_read += 1
+			elif kind == 'close':
+				return
+			else:
+				yield element
+
+	@staticmethod
+	def _place_name(element):
+		for child in element:
+			if _local(child.tag) == 'pname':
+				return child.get('value', '')
+		# Files before XML 1.7 have the name on the place itself
+		return element.get('name', '')
+
+	def events(self):
+		"""Yields (handle, (event type, month, day, year, place handle))."""
+		elements = self._elements_of('events', self._stream)
+		next(elements, None)
+		for element in elements:
+			if _local(element.tag) == 'event':
+				self.events_read += 1
+				yield _event(element)
+
+	def event(self, handle):
+		"""An event passed over on the way to people()."""
+		return self._events.get(handle, self._MISSING_EVENT)
+
+	def people(self):
+		"""
+		Yields (handle, gramps_id, (first name, suffix, surnames), gender,
+		event handles, family handles) for every person.
+		"""
+		order = _FirstMentions()
+		elements = self._elements_of('people', self._stream)
+		section = next(elements, None)
+		if section is not None and section.get('home'):
+			order.mention(_handle(section.get('home')))
+		for element in elements:
+			if _local(element.tag) != 'person':
+				continue
+			person, people_mentioned, families_mentioned = _person(element)
+			order.mention(person[0])
+			for handle in people_mentioned:
+				order.mention(handle)
+			for handle in families_mentioned:
+				self._family_order.mention(handle)
+			yield from order.add(person[0], person)
+		yield from order.flush()
+
+	def families(self):
+		"""Yields (handle, father, mother, relationship, event handles)."""
+		order = self._family_order
+		elements = self._elements_of('families', self._stream)
+		next(elements, None)
+		for element in elements:
+			if _local(element.tag) == 'family':
+				family = _family(element)
+				yield from order.add(family[0], family)
+		yield from order.flush()
+
+	def close(self):
+		self._stream.close()
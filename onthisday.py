@@ -1,9 +1,27 @@
 import sys
+import json
+import time
+import hashlib
+import tempfile
+import gzip
+import gettext
+import io
+import re
+import shlex
+import shutil
+import signal
+import sqlite3
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date
-from collections import defaultdict
+from collections import defaultdict, namedtuple, OrderedDict, Counter, deque
+from itertools import groupby
 import os
 from pathlib import Path
 
+from eventindex import DAYS, pack_index
+from gramps_xml import GrampsXml
+
 
 
 # Add the Gramps source directory to the path if not already there.
@@ -14,129 +32,997 @@ from pathlib import Path
 # Get the directory of the current script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Assuming 'gramps_src' is the submodule directory name
-GRAMPS_INSTALL_PATH = Path(sys.argv[1])
+# Assuming 'gramps_src' is the submodule directory name. It can be left out
+# when reading a .gramps file with --xml, which does not need Gramps.
+GRAMPS_INSTALL_PATH = None
+if len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+	GRAMPS_INSTALL_PATH = Path(sys.argv[1])
 
-if not os.path.exists(GRAMPS_INSTALL_PATH):
-	print(f"Error: Gramps submodule not found at {GRAMPS_INSTALL_PATH}")
-	print("Please ensure the submodule is correctly initialized and updated.")
-	sys.exit(1)
+	if not os.path.exists(GRAMPS_INSTALL_PATH):
+		print(f"Error: Gramps submodule not found at {GRAMPS_INSTALL_PATH}")
+		print("Please ensure the submodule is correctly initialized and updated.")
+		sys.exit(1)
 
-if GRAMPS_INSTALL_PATH not in sys.path:
-	sys.path.insert(0, GRAMPS_INSTALL_PATH)
+	if GRAMPS_INSTALL_PATH not in sys.path:
+		sys.path.insert(0, GRAMPS_INSTALL_PATH)
 
 
 
-# try:
-from gramps.gen.dbstate import DbState
-from gramps.cli.grampscli import CLIManager
-from gramps.gen.const import GRAMPS_LOCALE as glocale
-from gramps.gen.lib import Person, FamilyRelType
-from gramps.gen.lib.date import Date
-# except ImportError as e:
-#     print(
-#         "Error: Gramps modules not found. "
-#         "Please ensure the Gramps source directory is in your Python path."
-#     )
-#     print(
-#         "You might need to add it using sys.path.append('/path/to/gramps_src')"
-#     )
-#     print(e)
-#     sys.exit(1)
+# The CLI manager, plugin manager and database modules are imported where
+# they are used, so a headless run never loads them.
+_import_started = time.perf_counter()
+try:
+	from gramps.gen.const import GRAMPS_LOCALE as glocale
+	from gramps.gen.lib import Person, FamilyRelType, EventType
+	from gramps.gen.lib.date import Date
+	from gramps.gen.lib.gcalendar import gregorian_ymd
+	GRAMPS_AVAILABLE = True
+except ImportError:
+	# Enough to read a .gramps file and write English
+	from gramps_xml import Person, FamilyRelType
+	from calendars import gregorian_ymd
+	glocale = EventType = Date = None
+	GRAMPS_AVAILABLE = False
+
+GRAMPS_IMPORT_SECONDS = time.perf_counter() - _import_started
 
 # Internationalisation
-try:
-	_trans = glocale.get_addon_translator(__file__)
-except ValueError:
-	_trans = glocale.translation
+if glocale is None:
+	_trans = gettext.NullTranslations()
+else:
+	try:
+		_trans = glocale.get_addon_translator(__file__)
+	except ValueError:
+		_trans = glocale.translation
 _ = _trans.gettext
 
+# Name formatting has to match Name.get_regular_name(), which uses the
+# Gramps translation rather than ours.
+_name_gettext = glocale.translation.gettext if glocale else _
 
-class ThisDayInFamilyHistoryGenerator:
-	__UNSUPPORTED_EVENTS = [
-		'Alternate Parentage',
-		'Cause Of Death',
-		'Education',
-		'Medical Information',
-		'Number of Marriages',
-		'Occupation',
-		'Property',
-		'Religion',
-		'Residence',
-		'Will',
-		'Year',
-	]
+try:
+	from orjson import loads as json_loads
+except ImportError:
+	json_loads = json.loads
 
-	# These are the events we want to specifically track for "this day"
-	# For a website, we might want to be more selective than the Gramplet's
-	# default choices, especially for deceased individuals.
-	# I've started with a reasonable subset based on the Gramplet's defaults.
-	__EVENTS_TO_REPORT = [
-		'Adopted',
-		'Adult Christening',
-		'Birth',
-		'Death',
-		'Elected',
-		'Emigration',
-		'Graduation',
-		'Immigration',
-		'Marriage',
-		'Military Service',
-		'Naturalization',
-		'Nobility Title',
-		'Ordination',
-		'Retirement',
-		'Burial',  # Added burial for deceased context
-		'Cremation',  # Added cremation for deceased context
-	]
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# The handful of event fields the generator needs, extracted once per event.
+# month/day/year are Gregorian; month and day are 0 when unknown or invalid.
+EventIndexEntry = namedtuple(
+	'EventIndexEntry', ['event_type', 'month', 'day', 'year', 'place_handle']
+)
+
+# Stands in for an event a filtering backend left out of the index
+UNREPORTED_EVENT = EventIndexEntry('', 0, 0, 0, None)
+
+# What the event passes need to know about a person, built once per person.
+PersonSummary = namedtuple(
+	'PersonSummary', ['gramps_id', 'name', 'gender', 'deceased']
+)
+
+# The fields the generator reads from a person or family, whichever backend
+# they were read with.
+PersonRecord = namedtuple(
+	'PersonRecord',
+	['handle', 'gramps_id', 'name', 'gender', 'event_handles', 'family_handles'],
+)
+FamilyRecord = namedtuple(
+	'FamilyRecord',
+	['handle', 'father_handle', 'mother_handle', 'relationship', 'event_handles'],
+)
+
+
+class EventRecord:
+	"""
+	One event to report on a day. There is one of these per reported event
+	in memory until export, so it has slots rather than a __dict__, and the
+	names, places and types it repeats across records are interned.
+
+	Nothing in it is translated, so records can be rendered in any locale:
+	year is 0 and place None when unknown, handle_type is 'Person' or
+	'Family'.
+	"""
+
+	__slots__ = (
+		'name', 'gramps_id', 'gender', 'event_type', 'year', 'place',
+		'extra_info', 'handle', 'handle_type',
+	)
+
+	def __init__(
+		self, name, gramps_id, gender, event_type, year, place, extra_info,
+		handle, handle_type,
+	):
+		self.name = sys.intern(name)
+		self.gramps_id = gramps_id
+		self.gender = gender
+		self.event_type = sys.intern(event_type)
+		self.year = year
+		self.place = place and sys.intern(place)
+		self.extra_info = extra_info
+		self.handle = handle
+		self.handle_type = sys.intern(handle_type)
+
+	def to_list(self):
+		"""The fields in __slots__ order, as stored in the manifest."""
+		return [getattr(self, field) for field in self.__slots__]
+
+
+class ObjectBackend:
+	"""
+	Reads people, families, events and places through the regular
+	gramps.gen.lib objects. This is the reference extraction path.
+	"""
+
+	# True if iter_events() leaves out events that cannot matter, so an
+	# event missing from a full index needs no lookup
+	filters_events = False
+
+	def __init__(self, db):
+		self.db = db
+		# Set to a Counter to count calendar conversions
+		self.counters = None
+
+	def _event_entry(self, event):
+		month = day = year = 0
+		e_date = event.get_date_object()
+		if e_date.is_valid():
+			# Convert to Gregorian for consistent date matching
+			if e_date.get_calendar() != Date.CAL_GREGORIAN:
+				e_date = e_date.to_calendar('gregorian')
+				if self.counters is not None:
+					self.counters['date_conversions'] += 1
+			month = e_date.get_month()
+			day = e_date.get_day()
+			year = e_date.get_year()
+		return EventIndexEntry(
+			event.get_type().xml_str(), month, day, year,
+			event.get_place_handle(),
+		)
+
+	@staticmethod
+	def _person_record(person):
+		return PersonRecord(
+			person.handle,
+			person.get_gramps_id(),
+			person.get_primary_name().get_regular_name(),
+			person.get_gender(),
+			[ref.ref for ref in person.get_event_ref_list()],
+			person.get_family_handle_list(),
+		)
+
+	@staticmethod
+	def _family_record(family):
+		return FamilyRecord(
+			family.handle,
+			family.get_father_handle(),
+			family.get_mother_handle(),
+			int(family.get_relationship()),
+			[ref.ref for ref in family.get_event_ref_list()],
+		)
+
+	def iter_events(self):
+		"""Yields (handle, EventIndexEntry) for every event."""
+		for event in self.db.iter_events():
+			yield event.handle, self._event_entry(event)
+
+	def get_event(self, handle):
+		return self._event_entry(self.db.get_event_from_handle(handle))
+
+	def iter_people(self):
+		for person in self.db.iter_people():
+			yield self._person_record(person)
+
+	def get_person(self, handle):
+		"""Returns the PersonRecord for a handle, or None if there is none."""
+		if not self.db.has_person_handle(handle):
+			return None
+		return self._person_record(self.db.get_person_from_handle(handle))
+
+	def iter_families(self):
+		for family in self.db.iter_families():
+			yield self._family_record(family)
+
+	def get_family(self, handle):
+		"""Returns the FamilyRecord for a handle, or None if there is none."""
+		if not self.db.has_family_handle(handle):
+			return None
+		return self._family_record(self.db.get_family_from_handle(handle))
+
+	def get_place_name(self, handle):
+		return self.db.get_place_from_handle(handle).get_name().get_value()
+
+
+class RawBackend(ObjectBackend):
+	"""
+	Reads the same fields as ObjectBackend straight from the JSON columns of
+	a Gramps 6 SQLite database, without building gramps.gen.lib objects.
+	Only the fields the generator uses are pulled out with json_extract().
+	"""
+
+	_EVENT_SQL = (
+		"SELECT handle, "
+		"json_extract(json_data, '$.type.value'), "
+		"json_extract(json_data, '$.type.string'), "
+		"json_extract(json_data, '$.date.calendar'), "
+		"json_extract(json_data, '$.date.modifier'), "
+		"json_extract(json_data, '$.date.dateval[0]'), "
+		"json_extract(json_data, '$.date.dateval[1]'), "
+		"json_extract(json_data, '$.date.dateval[2]'), "
+		"json_extract(json_data, '$.date.sortval'), "
+		"json_extract(json_data, '$.place') "
+		"FROM event"
+	)
+	_EVENT_REFS_SQL = (
+		"(SELECT json_group_array(json_extract(value, '$.ref')) "
+		"FROM json_each(json_data, '$.event_ref_list'))"
+	)
+	_PERSON_SQL = (
+		"SELECT handle, "
+		"json_extract(json_data, '$.gramps_id'), "
+		"json_extract(json_data, '$.primary_name.first_name'), "
+		"json_extract(json_data, '$.primary_name.suffix'), "
+		"json_extract(json_data, '$.primary_name.surname_list'), "
+		"json_extract(json_data, '$.gender'), "
+		f"{_EVENT_REFS_SQL}, "
+		"json_extract(json_data, '$.family_list') "
+		"FROM person"
+	)
+	_FAMILY_SQL = (
+		"SELECT handle, "
+		"json_extract(json_data, '$.father_handle'), "
+		"json_extract(json_data, '$.mother_handle'), "
+		"json_extract(json_data, '$.type.value'), "
+		f"{_EVENT_REFS_SQL} "
+		"FROM family"
+	)
+
+	def __init__(self, db):
+		super().__init__(db)
+		self._event_types = {}
+
+	@classmethod
+	def supports(cls, db):
+		"""Checks that the database stores its records as JSON in SQL tables."""
+		return hasattr(db, 'dbapi') and \
+			getattr(db, 'serializer', None) is not None and \
+			db.serializer.data_field == 'json_data'
+
+	def _select(self, sql, args=()):
+		with self.db.dbapi.cursor() as cursor:
+			cursor.execute(sql, args)
+			rows = cursor.fetchmany()
+			while rows:
+				yield from rows
+				rows = cursor.fetchmany()
+
+	def _event_type(self, value, string):
+		"""Equivalent of EventType.xml_str(), memoized per (value, string)."""
+		key = (value, string)
+		try:
+			return self._event_types[key]
+		except KeyError:
+			e_type = self._event_types[key] = EventType(key).xml_str()
+			return e_type
+
+	# Batch size of the date conversion in iter_events
+	_DATE_BATCH = 65536
+
+	def _event_row_entry(self, row, gregorian=None):
+		"""
+		Builds the EventIndexEntry of an event row. gregorian is the (year,
+		month, day) of its sort value if that was already worked out.
+		"""
+		(
+			_handle, value, string, calendar, modifier, day, month, year,
+			sortval, place,
+		) = row
+		# Same rules as Date.is_valid() and Date.to_calendar('gregorian')
+		if modifier == Date.MOD_TEXTONLY or not sortval:
+			month = day = year = 0
+		elif calendar != Date.CAL_GREGORIAN:
+			if gregorian is None:
+				gregorian = gregorian_ymd(sortval)
+				if self.counters is not None:
+					self.counters['date_conversions'] += 1
+			year, month, day = gregorian
+		return EventIndexEntry(
+			self._event_type(value, string), month, day, year, place or None
+		)
+
+	def _event_batch(self, rows):
+		"""
+		Yields (handle, EventIndexEntry) for a list of event rows, converting
+		the sort values of all the non-Gregorian dates among them together.
+		"""
+		# Valid dates that are not Gregorian, as in _event_row_entry
+		textonly, gregorian = Date.MOD_TEXTONLY, Date.CAL_GREGORIAN
+		needs_conversion = [
+			row[4] != textonly and row[8] and row[3] != gregorian
+			for row in rows
+		]
+		sortvals = [
+			row[8] for row, needed in zip(rows, needs_conversion) if needed
+		]
+		if self.counters is not None:
+			self.counters['date_conversions'] += len(sortvals)
+		converted = iter(gregorian_ymd_batch(sortvals))
+		for row, needed in zip(rows, needs_conversion):
+			yield row[0], self._event_row_entry(
+				row, next(converted) if needed else None
+			)
+
+	def _person_row_record(self, row):
+		handle, gramps_id, first_name, suffix, surnames, gender, refs, families = row
+		return PersonRecord(
+			handle, gramps_id,
+			regular_name(first_name, suffix, json_loads(surnames)),
+			gender, json_loads(refs), json_loads(families),
+		)
+
+	@staticmethod
+	def _family_row_record(row):
+		handle, father_handle, mother_handle, relationship, refs = row
+		return FamilyRecord(
+			handle, father_handle, mother_handle, relationship, json_loads(refs)
+		)
+
+	def _get_one(self, sql, handle):
+		self.db.dbapi.execute(f"{sql} WHERE handle = ?", [handle])
+		return self.db.dbapi.fetchone()
+
+	def _event_rows(self, rows):
+		"""Yields (handle, EventIndexEntry) for event rows, in batches."""
+		batch = []
+		for row in rows:
+			batch.append(row)
+			if len(batch) == self._DATE_BATCH:
+				yield from self._event_batch(batch)
+				batch = []
+		yield from self._event_batch(batch)
+
+	def iter_events(self):
+		return self._event_rows(self._select(self._EVENT_SQL))
+
+	def get_event(self, handle):
+		return self._event_row_entry(self._get_one(self._EVENT_SQL, handle))
+
+	def iter_people(self):
+		for row in self._select(self._PERSON_SQL):
+			yield self._person_row_record(row)
+
+	def get_person(self, handle):
+		row = self._get_one(self._PERSON_SQL, handle)
+		return self._person_row_record(row) if row else None
+
+	def iter_families(self):
+		for row in self._select(self._FAMILY_SQL):
+			yield self._family_row_record(row)
+
+	def get_family(self, handle):
+		row = self._get_one(self._FAMILY_SQL, handle)
+		return self._family_row_record(row) if row else None
+
+	def get_place_name(self, handle):
+		self.db.dbapi.execute(
+			"SELECT json_extract(json_data, '$.name.value') FROM place "
+			"WHERE handle = ?", [handle]
+		)
+		return self.db.dbapi.fetchone()[0]
+
+
+class SqlBackend(RawBackend):
+	"""
+	RawBackend with the generator's event filters pushed into the query:
+	iter_events() only returns the events, owned by a person or family
+	according to the reference table, that can be reported (a reportable
+	type with a known day and month) or that mark someone as deceased. The
+	rest are never read into Python. Call set_event_filter() first.
+	"""
+
+	filters_events = True
+
+	# Same rules as _event_row_entry; a valid date that is not Gregorian
+	# always converts to a known day and month
+	_DATED_SQL = (
+		"json_extract(json_data, '$.date.modifier') != {textonly} "
+		"AND json_extract(json_data, '$.date.sortval') != 0 "
+		"AND (json_extract(json_data, '$.date.calendar') != {gregorian} "
+		"OR (json_extract(json_data, '$.date.dateval[0]') != 0 "
+		"AND json_extract(json_data, '$.date.dateval[1]') != 0))"
+	)
+
+	@staticmethod
+	def _type_sql(names, lower=False):
+		"""
+		A condition matching the events whose EventType.xml_str(), lowered
+		if lower, is in names, and its arguments.
+		"""
+		values = []
+		for xml_name in EventType().get_standard_xml():
+			e_type = EventType()
+			e_type.set_from_xml_str(xml_name)
+			if (xml_name.lower() if lower else xml_name) in names and \
+					int(e_type) != EventType.CUSTOM:
+				values.append(int(e_type))
+		custom = "json_extract(json_data, '$.type.string')"
+		sql = (
+			"json_extract(json_data, '$.type.value') IN "
+			f"({', '.join('?' * len(values))}) OR "
+			"(json_extract(json_data, '$.type.value') = ? AND "
+			f"{f'lower({custom})' if lower else custom} IN "
+			f"({', '.join('?' * len(names))}))"
+		)
+		return sql, values + [EventType.CUSTOM] + list(names)
+
+	def set_event_filter(self, reported_types, deceased_types):
+		"""
+		reported_types are the XML names of the event types to report and
+		deceased_types the lower-case names of those that mark a person as
+		deceased, as the generator compares them.
+		"""
+		reported, reported_args = self._type_sql(reported_types)
+		deceased, deceased_args = self._type_sql(deceased_types, lower=True)
+		dated = self._DATED_SQL.format(
+			textonly=Date.MOD_TEXTONLY, gregorian=Date.CAL_GREGORIAN,
+		)
+		self._event_query = (
+			f"{self._EVENT_SQL} WHERE ({deceased} OR (({reported}) AND {dated})) "
+			"AND EXISTS (SELECT 1 FROM reference "
+			"WHERE reference.ref_handle = event.handle "
+			"AND reference.obj_class IN ('Person', 'Family'))",
+			deceased_args + reported_args,
+		)
+
+	def iter_events(self):
+		return self._event_rows(self._select(*self._event_query))
+
+
+class XmlBackend(ObjectBackend):
+	"""
+	Reads the same fields from a Gramps XML export, through a GrampsXml
+	instead of a database; Gramps is not needed. The file is read front to
+	back, so events, people and families can only be iterated, in that
+	order, and a single person or family cannot be looked up.
+	"""
+
+	def iter_events(self):
+		for handle, fields in self.db.events():
+			yield handle, EventIndexEntry(*fields)
+
+	def get_event(self, handle):
+		return EventIndexEntry(*self.db.event(handle))
+
+	def iter_people(self):
+		for handle, gramps_id, name, gender, events, families in self.db.people():
+			yield PersonRecord(
+				handle, gramps_id, regular_name(*name), gender, events, families
+			)
+
+	def get_person(self, handle):
+		return None
+
+	def iter_families(self):
+		for fields in self.db.families():
+			yield FamilyRecord(*fields)
+
+	def get_family(self, handle):
+		return None
 
-	# --- Event message templates from the original gramplet, adapted for
-	#     standalone use ---
-	__EVENT_MESSAGE = {}
-	__EVENT_MESSAGE['adopted'] = {
+	def get_place_name(self, handle):
+		# The importer creates an empty place for a missing one
+		return self.db.place_names.get(handle, '')
+
+
+def regular_name(first_name, suffix, surnames):
+	"""
+	Equivalent of Name.get_regular_name() on the raw name fields, where
+	surnames is a list of dicts with 'prefix', 'surname' and 'connector'.
+	"""
+	_g = _name_gettext
+	surname = ""
+	for surn in surnames:
+		if surn['prefix']:
+			fsurn = _g("%(first)s %(second)s") % {
+				'first': surn['prefix'], 'second': surn['surname'],
+			}
+		else:
+			fsurn = surn['surname']
+		fsurn = fsurn.strip()
+		if surn['connector']:
+			fsurn = _g("%(first)s %(second)s") % {
+				'first': fsurn, 'second': surn['connector'],
+			}
+		fsurn = fsurn.strip()
+		surname = _g("%(first)s %(second)s") % {
+			'first': surname, 'second': fsurn,
+		}
+	surname = surname.strip()
+	if suffix == "":
+		return f"{first_name} {surname}"
+	return _g("%(first)s %(surname)s, %(suffix)s") % {
+		'surname': surname, 'first': first_name, 'suffix': suffix,
+	}
+
+
+def gregorian_ymd_batch(sortvals):
+	"""
+	gregorian_ymd() over a list of sort values (day numbers), returning a
+	list of (year, month, day). With NumPy installed the whole list is
+	converted in one vectorized pass, with the same integer arithmetic.
+	"""
+	if numpy is None or not sortvals:
+		return [gregorian_ymd(sdn) for sdn in sortvals]
+
+	# Constants and steps of gramps.gen.lib.gcalendar.gregorian_ymd()
+	temp = (32045 + numpy.asarray(sortvals, dtype=numpy.int64)) * 4 - 1
+	century = temp // 146097
+	temp = ((temp % 146097) // 4) * 4 + 3
+	year = century * 100 + temp // 1461
+	day_of_year = (temp % 1461) // 4 + 1
+	temp = day_of_year * 5 - 3
+	month = temp // 153
+	day = (temp % 153) // 5 + 1
+	late = month >= 10
+	month = numpy.where(late, month - 9, month + 3)
+	year = year + late - 4800
+	year = numpy.where(year <= 0, year - 1, year)
+	return list(zip(year.tolist(), month.tolist(), day.tolist()))
+
+
+def new_database(db_path):
+	"""
+	Creates an unopened database object of the backend a Gramps database
+	folder uses. SQLite is created directly, without loading any plugins.
+	"""
+	from gramps.gen.db.dbconst import DBBACKEND
+
+	with open(os.path.join(db_path, DBBACKEND), encoding='utf-8') as f:
+		backend_id = f.read().strip()
+	if backend_id == 'sqlite':
+		from gramps.plugins.db.dbapi.sqlite import SQLite
+		return SQLite()
+	from gramps.gen.db.utils import make_database
+	return make_database(backend_id)
+
+
+def open_database_readonly(db_path):
+	"""
+	Opens a Gramps database folder for reading, without going through the
+	CLI manager.
+	"""
+	from gramps.gen.db.dbconst import DBMODE_R
+
+	db = new_database(db_path)
+	db.load(db_path, mode=DBMODE_R)
+	return db
+
+
+def write_if_changed(filepath, payload):
+	"""
+	Replaces filepath with payload (bytes) unless the file already holds
+	exactly that content. The new file is written next to the old one and
+	renamed over it, so readers never see a partial file. Returns True if
+	the file was written.
+	"""
+	digest = hashlib.sha256(payload).digest()
+	try:
+		with open(filepath, 'rb') as f:
+			if hashlib.sha256(f.read()).digest() == digest:
+				return False
+	except FileNotFoundError:
+		pass
+
+	with atomic_writer(filepath) as f:
+		f.write(payload)
+	return True
+
+
+@contextmanager
+def atomic_writer(filepath):
+	"""
+	Yields a binary file that replaces filepath once the block completes.
+	Readers see either the old or the whole new file, never a partial one.
+	"""
+	fd, tmp_path = tempfile.mkstemp(
+		dir=os.path.dirname(filepath) or '.', prefix='.tmp-'
+	)
+	try:
+		with os.fdopen(fd, 'wb') as f:
+			yield f
+		# mkstemp creates files only we can read; the web server needs to
+		umask = os.umask(0)
+		os.umask(umask)
+		os.chmod(tmp_path, 0o666 & ~umask)
+		os.replace(tmp_path, filepath)
+	except BaseException:
+		os.unlink(tmp_path)
+		raise
+
+
+class PlaceNameCache:
+	"""
+	Bounded LRU cache of place names keyed by place handle.
+
+	Many events share a small number of places, so this saves loading the
+	same Place object from the database over and over.
+	"""
+
+	def __init__(self, load_name, maxsize=4096):
+		self.load_name = load_name
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self._names = OrderedDict()
+
+	def get(self, place_handle):
+		"""Returns the primary name of the place with the given handle."""
+		try:
+			name = self._names[place_handle]
+		except KeyError:
+			self.misses += 1
+			name = self.load_name(place_handle)
+			self._names[place_handle] = name
+			if len(self._names) > self.maxsize:
+				self._names.popitem(last=False)
+			return name
+		self.hits += 1
+		self._names.move_to_end(place_handle)
+		return name
+
+	def discard(self, place_handle):
+		"""Forgets a place, so its name is loaded again when next needed."""
+		self._names.pop(place_handle, None)
+
+	def report(self):
+		"""Prints the cache hit/miss counts."""
+		lookups = self.hits + self.misses
+		rate = (self.hits / lookups * 100) if lookups else 0
+		print(
+			f"Place cache: {self.hits} hits, {self.misses} misses "
+			f"({rate:.1f}% hit rate, {len(self._names)}/{self.maxsize} entries)."
+		)
+
+
+class SpillStore:
+	"""
+	Disk-backed state of a streaming run, in a temporary SQLite database:
+	the collected records, appended in extraction order and read back one
+	day at a time, and the summaries of deceased people, which the family
+	pass looks up. Memory use does not grow with the size of the tree.
+
+	It stands in for events_by_day (get) and, through contributions(), for
+	the person and family contributions the manifest is written from.
+	"""
+
+	def __init__(self, directory=None):
+		self._dir = tempfile.mkdtemp(prefix='onthisday-spill-', dir=directory)
+		self.connection = sqlite3.connect(os.path.join(self._dir, 'spill.db'))
+		self.connection.executescript(
+			"PRAGMA journal_mode = OFF;"
+			"PRAGMA synchronous = OFF;"
+			"CREATE TABLE records ("
+			"  seq INTEGER PRIMARY KEY, day INTEGER, kind TEXT,"
+			"  owner TEXT, data TEXT);"
+			"CREATE TABLE deceased (handle TEXT PRIMARY KEY, data TEXT);"
+		)
+		self.count = 0
+		self.summaries = _SpilledSummaries(self.connection)
+
+	def add(self, kind, owner, collected):
+		"""Appends the (day_key, EventRecord) pairs of a person or family."""
+		self.connection.executemany(
+			"INSERT INTO records (day, kind, owner, data) VALUES (?, ?, ?, ?)",
+			[
+				(
+					month * 100 + day, kind, owner,
+					json.dumps(record.to_list(), ensure_ascii=False),
+				)
+				for (month, day), record in collected
+			],
+		)
+		self.count += len(collected)
+
+	def finish(self):
+		"""Indexes the records by day, once they are all in."""
+		self.connection.execute("CREATE INDEX records_day ON records (day, seq)")
+
+	def get(self, day_key, default=()):
+		"""The records of a day, in the order they were added."""
+		month, day = day_key
+		rows = self.connection.execute(
+			"SELECT data FROM records WHERE day = ? ORDER BY seq",
+			[month * 100 + day],
+		)
+		return [EventRecord(*json_loads(data)) for (data,) in rows] or default
+
+	def contributions(self, kind):
+		return _SpilledContributions(self.connection, kind)
+
+	def close(self):
+		self.connection.close()
+		shutil.rmtree(self._dir, ignore_errors=True)
+
+
+class _SpilledSummaries:
+	"""person_summaries of a streaming run; only the deceased are kept."""
+
+	def __init__(self, connection):
+		self.connection = connection
+
+	def __setitem__(self, handle, summary):
+		if summary.deceased:
+			self.connection.execute(
+				"INSERT OR REPLACE INTO deceased VALUES (?, ?)",
+				[handle, json.dumps(summary, ensure_ascii=False)],
+			)
+
+	def get(self, handle, default=None):
+		row = self.connection.execute(
+			"SELECT data FROM deceased WHERE handle = ?", [handle]
+		).fetchone()
+		return PersonSummary(*json_loads(row[0])) if row else default
+
+	def __len__(self):
+		return self.connection.execute("SELECT COUNT(*) FROM deceased").fetchone()[0]
+
+
+class _SpilledContributions:
+	"""A read-only view of the records of one kind, grouped by owner."""
+
+	def __init__(self, connection, kind):
+		self.connection = connection
+		self.kind = kind
+
+	def items(self):
+		rows = self.connection.execute(
+			"SELECT owner, day, data FROM records WHERE kind = ? ORDER BY seq",
+			[self.kind],
+		)
+		# A person's or family's records were added together, so they are
+		# consecutive
+		for owner, owner_rows in groupby(rows, key=lambda row: row[0]):
+			yield owner, [
+				(divmod(day, 100), EventRecord(*json_loads(data)))
+				for _owner, day, data in owner_rows
+			]
+
+
+class Checkpoint:
+	"""
+	Progress of a full extraction, saved to checkpoint.db in the output
+	folder every interval seconds, so that an interrupted run can be
+	resumed: per pass, how many people or families are done and the last
+	handle, the records collected from them and the summaries of the
+	deceased. Rows are buffered and written together with the progress in
+	one transaction, so the file always describes a point the passes
+	reached. It is tied to the state of the database it was taken from.
+	"""
+
+	FILENAME = 'checkpoint.db'
+
+	def __init__(self, output_dir, db_version, interval=300.0):
+		self.path = os.path.join(output_dir, self.FILENAME)
+		self.db_version = json.dumps(db_version)
+		self.interval = interval
+		self.connection = None
+		# kind -> (position, last handle, pass finished)
+		self.progress = {}
+		self._records = []
+		self._deceased = []
+		self._saved_at = time.monotonic()
+
+	def load(self):
+		"""
+		Opens the checkpoint left in the output folder. Returns False if
+		there is none or it was taken from a different database state.
+		"""
+		if not os.path.exists(self.path):
+			return False
+		connection = sqlite3.connect(self.path)
+		try:
+			(version,) = connection.execute(
+				"SELECT value FROM meta WHERE key = 'db_version'"
+			).fetchone()
+		except (sqlite3.DatabaseError, TypeError):
+			version = None
+		if version != self.db_version:
+			connection.close()
+			return False
+		self.connection = connection
+		for kind, position, handle, done in connection.execute(
+			"SELECT kind, position, handle, done FROM progress"
+		):
+			self.progress[kind] = (position, handle, bool(done))
+		return True
+
+	def discard(self):
+		"""Removes any checkpoint file, to start from the beginning."""
+		if self.connection is not None:
+			self.connection.close()
+			self.connection = None
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+	def record(self, kind, position, handle, collected, summary=None):
+		"""
+		Notes that the position-th person or family of the pass, counting
+		from 1, is done, with its records and, for a deceased person, the
+		summary. Saves if the interval has passed.
+		"""
+		self.progress[kind] = (position, handle, False)
+		if collected:
+			self._records.append((kind, handle, collected))
+		if summary is not None:
+			self._deceased.append((handle, summary))
+		if time.monotonic() - self._saved_at >= self.interval:
+			self.save()
+
+	def finish(self, kind):
+		"""
+		Marks a pass as complete, and saves unless the run has been too
+		short to save anything yet.
+		"""
+		position, handle, _done = self.progress.get(kind, (0, None, False))
+		self.progress[kind] = (position, handle, True)
+		if self.connection is not None:
+			self.save()
+
+	def save(self):
+		if self.connection is None:
+			os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+			self.connection = sqlite3.connect(self.path)
+			self.connection.executescript(
+				"CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);"
+				"CREATE TABLE progress ("
+				"  kind TEXT PRIMARY KEY, position INTEGER, handle TEXT,"
+				"  done INTEGER);"
+				"CREATE TABLE records ("
+				"  seq INTEGER PRIMARY KEY, day INTEGER, kind TEXT,"
+				"  owner TEXT, data TEXT);"
+				"CREATE TABLE deceased (handle TEXT PRIMARY KEY, data TEXT);"
+			)
+			self.connection.execute(
+				"INSERT INTO meta VALUES ('db_version', ?)", [self.db_version]
+			)
+		with self.connection:
+			self.connection.executemany(
+				"INSERT INTO records (day, kind, owner, data) VALUES (?, ?, ?, ?)",
+				[
+					(
+						month * 100 + day, kind, handle,
+						json.dumps(record.to_list(), ensure_ascii=False),
+					)
+					for kind, handle, collected in self._records
+					for (month, day), record in collected
+				],
+			)
+			self.connection.executemany(
+				"INSERT OR REPLACE INTO deceased VALUES (?, ?)",
+				[
+					(handle, json.dumps(summary, ensure_ascii=False))
+					for handle, summary in self._deceased
+				],
+			)
+			self.connection.executemany(
+				"INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?)",
+				[
+					(kind, position, handle, done)
+					for kind, (position, handle, done) in self.progress.items()
+				],
+			)
+		self._records = []
+		self._deceased = []
+		self._saved_at = time.monotonic()
+
+	def contributions(self, kind):
+		"""(handle, collected) for the people or families saved, in order."""
+		return _SpilledContributions(self.connection, kind).items()
+
+	def summaries(self):
+		"""(handle, PersonSummary) for the deceased saved."""
+		for handle, data in self.connection.execute(
+			"SELECT handle, data FROM deceased"
+		):
+			yield handle, PersonSummary(*json_loads(data))
+
+
+class CountingDatabase:
+	"""
+	Wraps a Gramps database and counts calls to its get_*, iter_*, has_*
+	and find_* methods by name. Raw SQL through its dbapi connection is
+	counted as dbapi.execute and dbapi.cursor. Everything else is passed
+	straight through.
+	"""
+
+	_COUNTED_PREFIXES = ('get_', 'iter_', 'has_', 'find_')
+
+	def __init__(self, db, counters):
+		self._db = db
+		self._counters = counters
+
+	def __getattr__(self, name):
+		value = getattr(self._db, name)
+		if name == 'dbapi':
+			return _CountingConnection(value, self._counters)
+		if callable(value) and name.startswith(self._COUNTED_PREFIXES):
+			return _counted(value, f'db.{name}', self._counters)
+		return value
+
+
+class _CountingConnection:
+	def __init__(self, dbapi, counters):
+		self._dbapi = dbapi
+		self._counters = counters
+
+	def __getattr__(self, name):
+		value = getattr(self._dbapi, name)
+		if name in ('execute', 'cursor'):
+			return _counted(value, f'dbapi.{name}', self._counters)
+		return value
+
+
+def _counted(method, key, counters):
+	def counted(*args, **kwargs):
+		counters[key] += 1
+		return method(*args, **kwargs)
+	return counted
+
+
+def build_event_messages(_):
+	"""
+	Returns the event message templates from the original gramplet, adapted
+	for standalone use, translated with the gettext function _.
+	"""
+	messages = {}
+	messages['adopted'] = {
 		'male': _("%(male_name)s was adopted in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was adopted in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['adult christening'] = {
+	messages['adult christening'] = {
 		'male': _("%(male_name)s was christened in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was christened in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['alternate marriage'] = {
+	messages['alternate marriage'] = {
 		'male': _("%(male_name)s was married in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was married in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['annulment'] = {
+	messages['annulment'] = {
 		'male': _("%(male_name)s received an annulment in %(year)s at %(place)s."),
 		'female': _(
 			"%(female_name)s received an annulment in %(year)s at "
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['baptism'] = {
+	messages['baptism'] = {
 		'male': _("%(male_name)s was baptized in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was baptized in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['bar mitzvah'] = {
+	messages['bar mitzvah'] = {
 		'male': _("%(male_name)s became a bar mitzvah in %(year)s at %(place)s."),
 		'female': _("%(female_name)s became a bar mitzvah in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['bat mitzvah'] = {
+	messages['bat mitzvah'] = {
 		'male': _("%(male_name)s became a bat mitzvah in %(year)s at %(place)s."),
 		'female': _("%(female_name)s became a bat mitzvah in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['birth'] = {
+	messages['birth'] = {
 		'male': _("%(male_name)s was born in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was born in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['blessing'] = {
+	messages['blessing'] = {
 		'male': _("%(male_name)s was blessed in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was blessed in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['burial'] = {
+	messages['burial'] = {
 		'male': _("%(male_name)s was buried in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was buried in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['census'] = {
+	messages['census'] = {
 		'male': _(
 			"%(male_name)s participated in a census in %(year)s at "
 			"%(place)s."
@@ -146,50 +1032,50 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['christening'] = {
+	messages['christening'] = {
 		'male': _("%(male_name)s was christened in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was christened in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['confirmation'] = {
+	messages['confirmation'] = {
 		'male': _("%(male_name)s was confirmed in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was confirmed in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['cremation'] = {
+	messages['cremation'] = {
 		'male': _("%(male_name)s was cremated in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was cremated in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['death'] = {
+	messages['death'] = {
 		'male': _("%(male_name)s died in %(year)s at %(place)s."),
 		'female': _("%(female_name)s died in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['degree'] = {
+	messages['degree'] = {
 		'male': _("%(male_name)s was awarded a degree in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was awarded a degree in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['divorce'] = {
+	messages['divorce'] = {
 		'male': _("%(male_name)s was granted a divorce in %(year)s at " "%(place)s."),
 		'female': _(
 			"%(female_name)s was granted a divorce in %(year)s at "
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['divorce filing'] = {
+	messages['divorce filing'] = {
 		'male': _("%(male_name)s filed for divorce in %(year)s at %(place)s."),
 		'female': _("%(female_name)s filed for divorce in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['elected'] = {
+	messages['elected'] = {
 		'male': _("%(male_name)s was elected in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was elected in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['emigration'] = {
+	messages['emigration'] = {
 		'male': _("%(male_name)s emigrated in %(year)s at %(place)s."),
 		'female': _("%(female_name)s emigrated in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['engagement'] = {
+	messages['engagement'] = {
 		'male': _("%(male_name)s became engaged in %(year)s at %(place)s."),
 		'female': _("%(female_name)s became engaged in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['first communion'] = {
+	messages['first communion'] = {
 		'male': _(
 			"%(male_name)s received first communion in %(year)s at "
 			"%(place)s."
@@ -199,27 +1085,27 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['graduation'] = {
+	messages['graduation'] = {
 		'male': _("%(male_name)s graduated in %(year)s at %(place)s."),
 		'female': _("%(female_name)s graduated in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['immigration'] = {
+	messages['immigration'] = {
 		'male': _("%(male_name)s immigrated in %(year)s at %(place)s."),
 		'female': _("%(female_name)s immigrated in %(year)s at %(place)s."),
 	}
 
 	# Marriage event types
-	__EVENT_MESSAGE['marriage' + str(FamilyRelType.MARRIED)] = {
+	messages['marriage' + str(FamilyRelType.MARRIED)] = {
 		'male': _("%(male_name)s got married in %(year)s at %(place)s."),
 		'female': _("%(female_name)s got married in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['marriage' + str(FamilyRelType.UNMARRIED)] = {
+	messages['marriage' + str(FamilyRelType.UNMARRIED)] = {
 		'male': _("%(male_name)s joined as a family in %(year)s at %(place)s."),
 		'female': _(
 			"%(female_name)s joined as a family in %(year)s at %(place)s."
 		),
 	}
-	__EVENT_MESSAGE['marriage' + str(FamilyRelType.CIVIL_UNION)] = {
+	messages['marriage' + str(FamilyRelType.CIVIL_UNION)] = {
 		'male': _(
 			"%(male_name)s entered a civil union in %(year)s at %(place)s."
 		),
@@ -228,13 +1114,13 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['marriage' + str(FamilyRelType.UNKNOWN)] = {
+	messages['marriage' + str(FamilyRelType.UNKNOWN)] = {
 		'male': _("%(male_name)s joined as a family in %(year)s at %(place)s."),
 		'female': _(
 			"%(female_name)s joined as a family in %(year)s at %(place)s."
 		),
 	}
-	__EVENT_MESSAGE['marriage' + str(FamilyRelType.CUSTOM)] = {
+	messages['marriage' + str(FamilyRelType.CUSTOM)] = {
 		'male': _(
 			"%(male_name)s had a custom marriage in %(year)s at %(place)s."
 		),
@@ -243,7 +1129,7 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['marriage banns'] = {
+	messages['marriage banns'] = {
 		'male': _(
 			"%(male_name)s announced a marriage banns in %(year)s at "
 			"%(place)s."
@@ -253,7 +1139,7 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['marriage contract'] = {
+	messages['marriage contract'] = {
 		'male': _(
 			"%(male_name)s entered a marriage contract in %(year)s at "
 			"%(place)s."
@@ -263,7 +1149,7 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['marriage license'] = {
+	messages['marriage license'] = {
 		'male': _(
 			"%(male_name)s obtained a marriage license in %(year)s at "
 			"%(place)s."
@@ -273,7 +1159,7 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['marriage settlement'] = {
+	messages['marriage settlement'] = {
 		'male': _(
 			"%(male_name)s obtained a marriage settlement in %(year)s at "
 			"%(place)s."
@@ -283,7 +1169,7 @@ class ThisDayInFamilyHistoryGenerator:
 			"at %(place)s."
 		),
 	}
-	__EVENT_MESSAGE['military service'] = {
+	messages['military service'] = {
 		'male': _(
 			"%(male_name)s entered military service in %(year)s at "
 			"%(place)s."
@@ -293,44 +1179,256 @@ class ThisDayInFamilyHistoryGenerator:
 			"%(place)s."
 		),
 	}
-	__EVENT_MESSAGE['naturalization'] = {
+	messages['naturalization'] = {
 		'male': _("%(male_name)s became naturalized in %(year)s at %(place)s."),
 		'female': _(
 			"%(female_name)s became naturalized in %(year)s at %(place)s."
 		),
 	}
-	__EVENT_MESSAGE['nobility title'] = {
+	messages['nobility title'] = {
 		'male': _("%(male_name)s had a title bestowed in %(year)s at %(place)s."),
 		'female': _(
 			"%(female_name)s had a title bestowed in %(year)s at %(place)s."
 		),
 	}
-	__EVENT_MESSAGE['ordination'] = {
+	messages['ordination'] = {
 		'male': _("%(male_name)s was ordained in %(year)s at %(place)s."),
 		'female': _("%(female_name)s was ordained in %(year)s at %(place)s."),
 	}
-	__EVENT_MESSAGE['probate'] = {
+	messages['probate'] = {
 		'male': _("%(male_name)s was granted probate in %(year)s at %(place)s."),
 		'female': _(
 			"%(female_name)s was granted probate in %(year)s at %(place)s."
 		),
 	}
-	__EVENT_MESSAGE['retirement'] = {
+	messages['retirement'] = {
 		'male': _("%(male_name)s retired in %(year)s at %(place)s."),
 		'female': _("%(female_name)s retired in %(year)s at %(place)s."),
 	}
+	return messages
+
+
+class MessageFormatter:
+	"""
+	Renders event descriptions in one language. The templates are
+	translated once, and the template and name placeholder to use for each
+	(event type, gender, relationship) are worked out the first time they
+	are needed, so rendering an event is one lookup and one % format.
+	"""
+
+	def __init__(self, translator):
+		gettext = translator.gettext
+		self.messages = build_event_messages(gettext)
+		self.unknown_year = gettext("unknown")
+		self.unknown_place = gettext('unknown location')
+		self.handle_types = {
+			'Person': gettext('Person'), 'Family': gettext('Family'),
+		}
+		self._compiled = {}
+
+	@classmethod
+	def for_locale(cls, language=None):
+		"""Returns the formatter for a language code, or the default locale."""
+		if language is None:
+			return cls(_trans)
+		from gramps.gen.utils.grampslocale import GrampsLocale
+
+		locale = GrampsLocale(lang=language)
+		try:
+			translator = locale.get_addon_translator(__file__)
+		except ValueError:
+			translator = locale.translation
+		return cls(translator)
+
+	def _compile(self, event_type, gender, extra_info):
+		"""Returns (template, name placeholder) for one kind of event."""
+		e_str = event_type.lower()
+		# Handle marriage events with specific relationship types
+		if e_str == 'marriage':
+			e_str = e_str + str(extra_info)
+
+		# Default to male message if gender is unknown or not applicable
+		templates = self.messages.get(e_str, {})
+		msg_template = None
+		if gender == Person.FEMALE:
+			msg_template = templates.get('female')
+		if not msg_template:  # Fallback to male if female not found or default
+			msg_template = templates.get('male')
+
+		if not msg_template:
+			# Fallback if no specific message template exists
+			msg_template = (
+				"%(male_name)s experienced a "
+				f"{event_type.replace('%', '%%')} event "
+				"in %(year)s at %(place)s."
+			)
+
+		# Use the appropriate placeholder for the name
+		if gender == Person.FEMALE and '%(female_name)s' in msg_template:
+			return msg_template, 'female_name'
+		return msg_template, 'male_name'
+
+	def year(self, record):
+		return record.year or self.unknown_year
+
+	def place(self, record):
+		return self.unknown_place if record.place is None else record.place
+
+	def format(self, record):
+		"""Formats a single event record into a human-readable string."""
+		key = (record.event_type, record.gender, record.extra_info)
+		try:
+			msg_template, name_key = self._compiled[key]
+		except KeyError:
+			msg_template, name_key = self._compiled[key] = self._compile(*key)
+		return msg_template % {
+			name_key: record.name,
+			'year': self.year(record),
+			'place': self.place(record),
+		}
+
+
+class ThisDayInFamilyHistoryGenerator:
+	__UNSUPPORTED_EVENTS = [
+		'Alternate Parentage',
+		'Cause Of Death',
+		'Education',
+		'Medical Information',
+		'Number of Marriages',
+		'Occupation',
+		'Property',
+		'Religion',
+		'Residence',
+		'Will',
+		'Year',
+	]
+
+	# These are the events we want to specifically track for "this day"
+	# For a website, we might want to be more selective than the Gramplet's
+	# default choices, especially for deceased individuals.
+	# I've started with a reasonable subset based on the Gramplet's defaults.
+	__EVENTS_TO_REPORT = [
+		'Adopted',
+		'Adult Christening',
+		'Birth',
+		'Death',
+		'Elected',
+		'Emigration',
+		'Graduation',
+		'Immigration',
+		'Marriage',
+		'Military Service',
+		'Naturalization',
+		'Nobility Title',
+		'Ordination',
+		'Retirement',
+		'Burial',  # Added burial for deceased context
+		'Cremation',  # Added cremation for deceased context
+	]
 
-	def __init__(self, db_path):
+	# Any of these, in lower case, makes a person deceased
+	__DECEASED_EVENTS = ['death', 'burial', 'cremation']
+
+	def __init__(
+		self, db_path, place_cache_size=4096, backend='objects', db=None,
+		headless=False, instrument=False,
+	):
 		self.db_path = db_path
+		self.place_cache_size = place_cache_size
+		self.timings = {'import': GRAMPS_IMPORT_SECONDS, 'open': 0.0}
+		# Database calls, date conversions, renders and bytes written are
+		# only counted when asked for, as the counting itself costs time.
+		self.counters = Counter() if instrument else None
+		if db is None:
+			if backend == 'xml':
+				db = self._open_xml(db_path)
+			elif headless:
+				db = self._open_headless(db_path)
+			else:
+				db = self._open_with_cli_manager(db_path)
+			print(
+				f"Gramps imports took {self.timings['import']:.2f}s, "
+				f"opening the database took {self.timings['open']:.2f}s."
+			)
+		if instrument:
+			db = CountingDatabase(db, self.counters)
+		self.db = db
+		if backend in ('raw', 'sql') and not RawBackend.supports(self.db):
+			print("Database is not JSON-backed SQL; using the object backend.")
+			backend = 'objects'
+		self.backend = {
+			'raw': RawBackend, 'sql': SqlBackend, 'xml': XmlBackend,
+		}.get(backend, ObjectBackend)(self.db)
+		self.backend.counters = self.counters
+		if self.backend.filters_events:
+			self.backend.set_event_filter(
+				[
+					e_type for e_type in self.__EVENTS_TO_REPORT
+					if e_type not in self.__UNSUPPORTED_EVENTS
+				],
+				self.__DECEASED_EVENTS,
+			)
+		self.deceased_person_handles = set()
+		self.person_summaries = {}
+		# Once every person has been through the person pass, a handle
+		# without a summary is a dangling reference, not one to load.
+		self.all_people_summarized = False
+		self.event_index = {}
+		# Set once event_index holds every event that can matter, when the
+		# backend filters them
+		self.event_index_complete = False
+		# Start time of the last run, and its counters when run by watch()
+		self.last_run = None
+		self.watch_stats = None
+		# Reportable (day_key, event_data) pairs per person/family handle,
+		# in database order; events_by_day is bucketed from these.
+		self.person_contributions = {}
+		self.family_contributions = {}
+		self.place_names = PlaceNameCache(
+			self.backend.get_place_name, place_cache_size
+		)
+		self.events_by_day = defaultdict(list)
+		self.formatter = MessageFormatter.for_locale()
+
+	def _open_with_cli_manager(self, db_path):
+		"""
+		Opens the database the way the Gramps CLI does, registering every
+		plugin first. This can pop up dialogs.
+		"""
+		started = time.perf_counter()
+		from gramps.gen.dbstate import DbState
+		from gramps.cli.grampscli import CLIManager
+		self.timings['import'] += time.perf_counter() - started
+
+		started = time.perf_counter()
 		self.dbstate = DbState()
 		self.dbman = CLIManager(self.dbstate, True, None)
 	
 		self.dbman.do_reg_plugins(self.dbstate, uistate=None)
 	    # reload_custom_filters()
 		self.dbman.open_activate(db_path)
-		self.db = self.dbstate.db
-		self.deceased_person_gids = set()
-		self.events_by_day = defaultdict(list)
+		self.timings['open'] = time.perf_counter() - started
+		return self.dbstate.db
+
+	def _open_headless(self, db_path):
+		"""Opens the database read-only, straight through its backend."""
+		from gramps.gen.db.dbconst import DBMODE_R
+
+		started = time.perf_counter()
+		db = new_database(db_path)
+		self.timings['import'] += time.perf_counter() - started
+
+		started = time.perf_counter()
+		db.load(db_path, mode=DBMODE_R)
+		self.timings['open'] = time.perf_counter() - started
+		return db
+
+	def _open_xml(self, db_path):
+		"""Opens a Gramps XML export, which reads its place names."""
+		started = time.perf_counter()
+		db = GrampsXml(db_path)
+		self.timings['open'] = time.perf_counter() - started
+		return db
 
 	def connect_db(self):
 		"""Connects to the Gramps database."""
@@ -346,34 +1444,77 @@ class ThisDayInFamilyHistoryGenerator:
 		self.db.close()
 		print("Gramps database connection closed.")
 
-	def _is_person_deceased(self, person):
+	@contextmanager
+	def _timed(self, phase):
+		"""Adds the wall time of the enclosed block to timings[phase]."""
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.timings[phase] = (
+				self.timings.get(phase, 0.0) + time.perf_counter() - started
+			)
+
+	def _build_event_index(self):
+		"""Loads every event once and keeps what we need, keyed by handle."""
+		for handle, entry in self.backend.iter_events():
+			self.event_index[handle] = entry
+
+	def _get_event_entry(self, handle):
+		"""Returns the index entry for an event, loading it if not indexed yet."""
+		entry = self.event_index.get(handle)
+		if entry is None:
+			if self.event_index_complete:
+				# Neither reportable nor a death: left out by the backend
+				return UNREPORTED_EVENT
+			entry = self.backend.get_event(handle)
+			self.event_index[handle] = entry
+		return entry
+
+	def _is_person_deceased(self, entries):
 		"""Checks if a person has a death or burial event."""
-		for ref in person.get_event_ref_list():
-			event = self.db.get_event_from_handle(ref.ref)
-			e_type = event.get_type().xml_str().lower()
-			if e_type in ['death', 'burial', 'cremation']:
+		for entry in entries:
+			if entry.event_type.lower() in self.__DECEASED_EVENTS:
 				return True
 		return False
 
-	def _get_place_name(self, event):
-		"""Extracts the primary place name for an event."""
-		for r in event.get_referenced_handles():
-			if r[0] == 'Place':  # r[0] is the type, r[1] is the handle
-				place = self.db.get_place_from_handle(r[1])
-				return place.get_name().get_value()
-		return _('unknown location')
+	def _get_place_name(self, place_handle):
+		"""Extracts the primary place name for an event, or None."""
+		if place_handle:
+			return self.place_names.get(place_handle)
+		return None
+
+	def _summarize_person(self, person, entries):
+		"""Builds the person summary from a person and their event entries."""
+		return PersonSummary(
+			person.gramps_id, person.name, person.gender,
+			self._is_person_deceased(entries),
+		)
 
-	def _get_person_event_data(self, person, event, e_date):
+	def _get_person_summary(self, handle):
+		"""Returns the summary for a person handle, loading it if needed."""
+		summary = self.person_summaries.get(handle)
+		if summary is None and not self.all_people_summarized:
+			# Partners can point at people that no longer exist
+			person = self.backend.get_person(handle) if handle else None
+			if person is None:
+				return None
+			entries = [
+				self._get_event_entry(event_handle)
+				for event_handle in person.event_handles
+			]
+			summary = self._summarize_person(person, entries)
+			self.person_summaries[handle] = summary
+		return summary
+
+	def _get_person_event_data(self, person_handle, summary, entry):
 		"""Extracts and formats data for a person event."""
-		e_type = event.get_type().xml_str()
+		e_type = entry.event_type
 		if e_type in self.__UNSUPPORTED_EVENTS or e_type not in self.__EVENTS_TO_REPORT:
 			return None
 
-		name = person.get_primary_name().get_regular_name()
-		gramps_id = person.serialize()[1]
-		gender = person.get_gender()
-		year = e_date.get_year() or _("unknown")
-		place = self._get_place_name(event)
+		year = entry.year
+		place = self._get_place_name(entry.place_handle)
 
 		extra_info = ''
 		if e_type.lower() == 'marriage':
@@ -382,214 +1523,851 @@ class ThisDayInFamilyHistoryGenerator:
 			# as a placeholder if not linked to a family.
 			extra_info = int(FamilyRelType.UNKNOWN)
 
-		return {
-			'name': name,
-			'gramps_id': gramps_id,
-			'gender': gender,
-			'event_type': e_type,
-			'year': year,
-			'place': place,
-			'extra_info': extra_info,
-			'handle': person.handle,  # For potential future linking
-			'handle_type': _('Person'),
-		}
+		return EventRecord(
+			name=summary.name,
+			gramps_id=summary.gramps_id,
+			gender=summary.gender,
+			event_type=e_type,
+			year=year,
+			place=place,
+			extra_info=extra_info,
+			handle=person_handle,  # For potential future linking
+			handle_type='Person',
+		)
 
-	def _get_family_event_data(self, family, event, e_date):
-		"""Extracts and formats data for a family event."""
-		e_type = event.get_type().xml_str()
+	def _get_family_event_data(self, family, partners, entry):
+		"""
+		Extracts and formats data for a family event. partners is the
+		(name, gramps_id) of the couple, the same for all of its events.
+		"""
+		e_type = entry.event_type
 		if e_type in self.__UNSUPPORTED_EVENTS or e_type not in self.__EVENTS_TO_REPORT:
 			return None
 
-		father_handle = family.get_father_handle()
-		mother_handle = family.get_mother_handle()
-
-		father = (
-			self.db.get_person_from_handle(father_handle)
-			if father_handle
-			else None
-		)
-		mother = (
-			self.db.get_person_from_handle(mother_handle)
-			if mother_handle
-			else None
+		name, gramps_id = partners
+		gender = Person.UNKNOWN  # Family events don't have a single gender
+		year = entry.year
+		place = self._get_place_name(entry.place_handle)
+		extra_info = family.relationship
+
+		return EventRecord(
+			name=name,
+			gramps_id=gramps_id,
+			gender=gender,
+			event_type=e_type,
+			year=year,
+			place=place,
+			extra_info=extra_info,
+			handle=family.handle,  # For potential future linking
+			handle_type='Family',
 		)
 
-		father_name = (
-			father.get_primary_name().get_regular_name()
-			if father
-			else _('Unknown Father')
-		)
-		mother_name = (
-			mother.get_primary_name().get_regular_name()
-			if mother
-			else _('Unknown Mother')
+	def _collect_person_events(self, person):
+		"""
+		Summarizes a person and returns the (day_key, event_data) pairs to
+		report for them. Only deceased people have events reported.
+		"""
+		entries = [
+			self._get_event_entry(event_handle)
+			for event_handle in person.event_handles
+		]
+		summary = self._summarize_person(person, entries)
+		self.person_summaries[person.handle] = summary
+		if not summary.deceased:
+			return []
+
+		self.deceased_person_handles.add(person.handle)
+		collected = []
+		for entry in entries:
+			if entry.day and entry.month:  # Ensure day and month are known
+				event_data = self._get_person_event_data(
+					person.handle, summary, entry
+				)
+				if event_data:
+					collected.append(((entry.month, entry.day), event_data))
+		return collected
+
+	def _collect_family_events(self, family):
+		"""
+		Returns the (day_key, event_data) pairs to report for a family.
+		Only families where *both* partners are deceased are reported.
+		"""
+		# If one or both partners are unknown, we don't include it in this
+		# specific "deceased individuals only" report.
+		# Partners are looked up once per family, in the summaries the
+		# person pass left behind, never loaded again from the database.
+		father = self._get_person_summary(family.father_handle)
+		mother = self._get_person_summary(family.mother_handle)
+		if not (father and father.deceased and mother and mother.deceased):
+			return []
+
+		partners = (
+			f"{father.name} and {mother.name}",
+			f"{father.gramps_id}-{mother.gramps_id}",
 		)
+		collected = []
+		for event_handle in family.event_handles:
+			entry = self._get_event_entry(event_handle)
+			if entry.day and entry.month:
+				event_data = self._get_family_event_data(family, partners, entry)
+				if event_data:
+					collected.append(((entry.month, entry.day), event_data))
+		return collected
+
+	def _bucket_contributions(self):
+		"""Rebuilds events_by_day from the per-person/family contributions."""
+		self.events_by_day = defaultdict(list)
+		for contributions in (self.person_contributions, self.family_contributions):
+			for collected in contributions.values():
+				for day_key, event_data in collected:
+					self.events_by_day[day_key].append(event_data)
 
-		# Check if both partners are deceased
-		is_father_deceased = father and (father.serialize()[1] in self.deceased_person_gids)
-		is_mother_deceased = mother and (mother.serialize()[1] in self.deceased_person_gids)
-
-		if not (is_father_deceased and is_mother_deceased):
-			return None  # Only report family events where *both* are deceased
-
-		name = f"{father_name} and {mother_name}"
-		gramps_id = f"{father.serialize()[1] if father else ''}-" \
-					f"{mother.serialize()[1] if mother else ''}"
-		gender = Person.UNKNOWN  # Family events don't have a single gender
-		year = e_date.get_year() or _("unknown")
-		place = self._get_place_name(event)
-		extra_info = int(family.get_relationship())
-
-		return {
-			'name': name,
-			'gramps_id': gramps_id,
-			'gender': gender,
-			'event_type': e_type,
-			'year': year,
-			'place': place,
-			'extra_info': extra_info,
-			'handle': family.handle,  # For potential future linking
-			'handle_type': _('Family'),
-		}
-
-	def generate_events_for_deceased(self):
+	def _pass(self, kind, objects, checkpoint):
+		"""
+		Yields (position, person or family) from the iterator of a pass,
+		counting from 1, past those a resumed checkpoint has done already.
+		"""
+		position, handle, _done = (
+			checkpoint.progress.get(kind, (0, None, False)) if checkpoint
+			else (0, None, False)
+		)
+		if position:
+			print(f"Resuming the {kind} pass after the first {position}.")
+		for current, obj in enumerate(objects, 1):
+			if current < position:
+				continue
+			if current == position:
+				if obj.handle != handle:
+					raise RuntimeError(
+						f"{kind} {current} is {obj.handle}, the checkpoint has "
+						f"{handle}; run without --resume"
+					)
+				continue
+			yield current, obj
+
+	def _checkpoint_person(self, checkpoint, position, person, collected):
+		if checkpoint is not None:
+			summary = None
+			if person.handle in self.deceased_person_handles:
+				summary = self.person_summaries.get(person.handle)
+			checkpoint.record('person', position, person.handle, collected, summary)
+
+	@staticmethod
+	def _done(checkpoint, kind):
+		return checkpoint is not None and \
+			checkpoint.progress.get(kind, (0, None, False))[2]
+
+	def generate_events_for_deceased(self, checkpoint=None):
 		"""
 		Iterates through the database to find events for deceased individuals
-		and categorizes them by day and month.
+		and categorizes them by day and month. With a checkpoint, progress
+		is saved to it, and what a resumed one has done is loaded instead
+		of extracted again.
 		"""
-		print("Identifying deceased individuals...")
-		# First pass: identify all deceased persons by Gramps ID
-		for person in self.db.iter_people():
-			if self._is_person_deceased(person):
-				self.deceased_person_gids.add(person.serialize()[1])
-
-		print(f"Found {len(self.deceased_person_gids)} deceased individuals.")
-		print("Collecting events for deceased individuals and their families...")
+		if checkpoint is not None and checkpoint.progress:
+			for handle, summary in checkpoint.summaries():
+				self.person_summaries[handle] = summary
+				self.deceased_person_handles.add(handle)
+			self.person_contributions.update(checkpoint.contributions('person'))
+			self.family_contributions.update(checkpoint.contributions('family'))
+
+		if not self._done(checkpoint, 'family'):
+			print("Indexing events...")
+			with self._timed('index_events'):
+				self._build_event_index()
+			self.event_index_complete = self.backend.filters_events
+			print(f"Indexed {len(self.event_index)} events.")
+
+		print("Collecting events for deceased individuals...")
+		# Single pass over people: a person is deceased if any of their
+		# events is a death, burial or cremation; only then are their
+		# events collected. Both read from the event index.
+		with self._timed('person_events'):
+			if not self._done(checkpoint, 'person'):
+				for position, person in self._pass(
+					'person', self.backend.iter_people(), checkpoint
+				):
+					collected = self._collect_person_events(person)
+					if collected:
+						self.person_contributions[person.handle] = collected
+					self._checkpoint_person(checkpoint, position, person, collected)
+				if checkpoint is not None:
+					checkpoint.finish('person')
+
+		self.all_people_summarized = True
+		# Only the deceased matter to the family pass; anyone not in the
+		# table is treated as living, as in the parallel pass.
+		self.person_summaries = {
+			handle: self.person_summaries[handle]
+			for handle in self.deceased_person_handles
+		}
 
-		# Second pass: collect events for deceased persons
-		for person in self.db.iter_people():
-			person_gid = person.serialize()[1]
-			if person_gid in self.deceased_person_gids:
-				for ref in person.get_event_ref_list():
-					event = self.db.get_event_from_handle(ref.ref)
-					e_date = event.get_date_object()
+		print(f"Found {len(self.deceased_person_handles)} deceased individuals.")
+		print("Collecting events for families of deceased individuals...")
+
+		# Second pass: collect events for families where *both* partners are deceased
+		with self._timed('family_events'):
+			if not self._done(checkpoint, 'family'):
+				for position, family in self._pass(
+					'family', self.backend.iter_families(), checkpoint
+				):
+					collected = self._collect_family_events(family)
+					if collected:
+						self.family_contributions[family.handle] = collected
+					if checkpoint is not None:
+						checkpoint.record('family', position, family.handle, collected)
+				if checkpoint is not None:
+					checkpoint.finish('family')
+
+		self._bucket_contributions()
+		print("Finished collecting events.")
 
-					if not e_date.is_valid():
-						continue
+	def generate_events_streaming(self, spill, checkpoint=None):
+		"""
+		Same passes and output as generate_events_for_deceased, with memory
+		that does not grow with the tree: events are read when a person or
+		family needs them instead of being indexed up front, and deceased
+		summaries and the collected records go to spill, a SpillStore.
+		"""
+		self.person_summaries = spill.summaries
+		self.events_by_day = spill
+		self.person_contributions = spill.contributions('person')
+		self.family_contributions = spill.contributions('family')
+		if checkpoint is not None and checkpoint.progress:
+			for handle, summary in checkpoint.summaries():
+				spill.summaries[handle] = summary
+			for kind in ('person', 'family'):
+				for handle, collected in checkpoint.contributions(kind):
+					spill.add(kind, handle, collected)
+
+		print("Collecting events for deceased individuals, streaming...")
+		with self._timed('person_events'):
+			if not self._done(checkpoint, 'person'):
+				for position, person in self._pass(
+					'person', self.backend.iter_people(), checkpoint
+				):
+					collected = self._collect_person_events(person)
+					if collected:
+						spill.add('person', person.handle, collected)
+					self._checkpoint_person(checkpoint, position, person, collected)
+					self.event_index.clear()
+					self.deceased_person_handles.clear()
+				if checkpoint is not None:
+					checkpoint.finish('person')
+
+		self.all_people_summarized = True
+		print(f"Found {len(spill.summaries)} deceased individuals.")
+		print("Collecting events for families of deceased individuals...")
+
+		with self._timed('family_events'):
+			if not self._done(checkpoint, 'family'):
+				for position, family in self._pass(
+					'family', self.backend.iter_families(), checkpoint
+				):
+					collected = self._collect_family_events(family)
+					if collected:
+						spill.add('family', family.handle, collected)
+					if checkpoint is not None:
+						checkpoint.record('family', position, family.handle, collected)
+					self.event_index.clear()
+				if checkpoint is not None:
+					checkpoint.finish('family')
+
+		spill.finish()
+		print(f"Finished collecting {spill.count} events.")
+
+	def record_count(self):
+		"""The number of records collected for export."""
+		if isinstance(self.events_by_day, SpillStore):
+			return self.events_by_day.count
+		return sum(len(events) for events in self.events_by_day.values())
+
+	def _extract_people(self, handles):
+		"""
+		Worker side of the parallel person pass. Returns the contributions
+		of the given people, in order, and the summaries of those deceased.
+		"""
+		contributions = []
+		deceased = {}
+		for handle in handles:
+			person = self.backend.get_person(handle)
+			collected = self._collect_person_events(person)
+			if collected:
+				contributions.append((handle, collected))
+			if handle in self.deceased_person_handles:
+				deceased[handle] = self.person_summaries[handle]
+		# Only the next shard's people are needed, so free this shard's
+		self.person_summaries.clear()
+		self.deceased_person_handles.clear()
+		self.event_index.clear()
+		return contributions, deceased, self._take_stats()
+
+	def _extract_families(self, handles):
+		"""Worker side of the parallel family pass."""
+		contributions = []
+		for handle in handles:
+			collected = self._collect_family_events(self.backend.get_family(handle))
+			if collected:
+				contributions.append((handle, collected))
+		self.event_index.clear()
+		return contributions, self._take_stats()
+
+	def _take_stats(self):
+		"""Returns and resets the place cache counts and counters."""
+		counters = None
+		if self.counters is not None:
+			counters = dict(self.counters)
+			self.counters.clear()
+		stats = (self.place_names.hits, self.place_names.misses, counters)
+		self.place_names.hits = self.place_names.misses = 0
+		return stats
+
+	def _add_stats(self, stats):
+		hits, misses, counters = stats
+		self.place_names.hits += hits
+		self.place_names.misses += misses
+		if self.counters is not None:
+			self.counters.update(counters)
+
+	@staticmethod
+	def _shard(handles, workers):
+		"""Splits handles into contiguous shards, a few per worker."""
+		size = max(1, -(-len(handles) // (workers * 4)))
+		return [handles[i:i + size] for i in range(0, len(handles), size)]
+
+	def generate_events_for_deceased_parallel(self, workers):
+		"""
+		Same as generate_events_for_deceased, but spreads the person and
+		family passes over worker processes, each with its own read-only
+		connection. Shards are merged back in database order, so the output
+		is identical to a serial run.
+		"""
+		# Cut in the order the serial pass reads, not the handle order
+		# iter_person_handles() gives
+		person_handles = self._handles_in_table_order('person')
+		family_handles = self._handles_in_table_order('family')
+		backend = 'raw' if isinstance(self.backend, RawBackend) else 'objects'
+		init_args = (
+			self.db_path, self.place_cache_size, backend,
+			self.counters is not None,
+		)
 
-					# Convert to Gregorian for consistent date matching
-					if e_date.get_calendar() != Date.CAL_GREGORIAN:
-						e_date = e_date.to_calendar('gregorian')
+		print(f"Collecting events for deceased individuals with {workers} workers...")
+		deceased = {}
+		with self._timed('person_events'), ProcessPoolExecutor(
+			workers, initializer=_init_worker, initargs=init_args
+		) as pool:
+			for contributions, shard_deceased, stats in pool.map(
+				_extract_people_shard, self._shard(person_handles, workers)
+			):
+				self.person_contributions.update(contributions)
+				deceased.update(shard_deceased)
+				self._add_stats(stats)
+
+		self.person_summaries = deceased
+		self.deceased_person_handles = set(deceased)
+		print(f"Found {len(deceased)} deceased individuals.")
+		print("Collecting events for families of deceased individuals...")
+
+		# Partners missing from the deceased table are not deceased, so the
+		# family workers never need to load a person.
+		with self._timed('family_events'), ProcessPoolExecutor(
+			workers, initializer=_init_worker, initargs=init_args + (deceased,)
+		) as pool:
+			for contributions, stats in pool.map(
+				_extract_families_shard, self._shard(family_handles, workers)
+			):
+				self.family_contributions.update(contributions)
+				self._add_stats(stats)
+
+		self._bucket_contributions()
+		print("Finished collecting events.")
 
-					e_day = e_date.get_day()
-					e_month = e_date.get_month()
+	def _changed_handles(self, table, since):
+		"""Returns the handles in a table changed at or after a timestamp."""
+		self.db.dbapi.execute(
+			f"SELECT handle FROM {table} WHERE change >= ?", [since]
+		)
+		return {row[0] for row in self.db.dbapi.fetchall()}
 
-					if e_day and e_month:  # Ensure day and month are known
-						event_data = self._get_person_event_data(
-							person, event, e_date
-						)
-						if event_data:
-							day_key = (e_month, e_day)
-							self.events_by_day[day_key].append(event_data)
+	def _handles_in_table_order(self, table):
+		"""
+		Returns the handles of a table in the order full passes read its
+		rows. iter_person_handles() and the like read the handle index, in
+		handle order, while reading whole rows scans the table in rowid
+		order. Databases without SQL give their handles in their own order.
+		"""
+		if not hasattr(self.db, 'dbapi'):
+			return list(getattr(self.db, f"iter_{table}_handles")())
+		self.db.dbapi.execute(f"SELECT handle FROM {table} ORDER BY rowid")
+		return [row[0] for row in self.db.dbapi.fetchall()]
 
-		# Third pass: collect events for families where *both* partners are deceased
-		for family in self.db.iter_families():
-			father_handle = family.get_father_handle()
-			mother_handle = family.get_mother_handle()
+	def update_events_for_deceased(self, manifest):
+		"""
+		Re-extracts only the people and families touched since the run that
+		wrote the manifest, reusing the manifest's records for the rest.
+		Returns the set of day keys whose content may have changed.
+		"""
+		since = manifest['last_run']
+		self.person_contributions = manifest['people']
+		self.family_contributions = manifest['families']
+
+		people = self._changed_handles('person', since)
+		families = self._changed_handles('family', since)
+		events = self._changed_handles('event', since)
+		# A renamed place changes the text of every event that uses it
+		places = self._changed_handles('place', since)
+		for place_handle in places:
+			events.update(
+				handle for _cls, handle in
+				self.db.find_backlink_handles(place_handle, ['Event'])
+			)
+		for event_handle in events:
+			for cls, handle in self.db.find_backlink_handles(
+				event_handle, ['Person', 'Family']
+			):
+				(people if cls == 'Person' else families).add(handle)
+
+		# What earlier passes cached about changed objects is stale; this
+		# matters when the generator is kept running with --watch
+		self.event_index_complete = False
+		for event_handle in events:
+			self.event_index.pop(event_handle, None)
+		for place_handle in places:
+			self.place_names.discard(place_handle)
+
+		# Deleted people and families only show up as missing handles
+		people_order = self._handles_in_table_order('person')
+		family_order = self._handles_in_table_order('family')
+		existing_people = set(people_order)
+		existing_families = set(family_order)
+		people.update(set(self.person_contributions) - existing_people)
+		families.update(set(self.family_contributions) - existing_families)
+		print(
+			f"Re-extracting {len(people)} changed people and "
+			f"{len(families)} changed families since {time.ctime(since)}..."
+		)
 
-			father_gid = (
-				self.db.get_person_from_handle(father_handle).serialize()[1]
-				if father_handle
-				else None
+		affected_days = set()
+		for handle in people:
+			affected_days.update(
+				day_key for day_key, _data in
+				self.person_contributions.get(handle, [])
 			)
-			mother_gid = (
-				self.db.get_person_from_handle(mother_handle).serialize()[1]
-				if mother_handle
-				else None
+			collected = []
+			self.person_summaries.pop(handle, None)
+			self.deceased_person_handles.discard(handle)
+			person = self.backend.get_person(handle)
+			if person is not None:
+				# A change in deceased status or name shows in their families
+				families.update(person.family_handles)
+				collected = self._collect_person_events(person)
+			self._set_contribution(self.person_contributions, handle, collected)
+			affected_days.update(day_key for day_key, _data in collected)
+
+		for handle in families:
+			affected_days.update(
+				day_key for day_key, _data in
+				self.family_contributions.get(handle, [])
 			)
+			collected = []
+			family = self.backend.get_family(handle)
+			if family is not None:
+				collected = self._collect_family_events(family)
+			self._set_contribution(self.family_contributions, handle, collected)
+			affected_days.update(day_key for day_key, _data in collected)
+
+		# Keep database order so the day files match a full run
+		self.person_contributions = {
+			handle: self.person_contributions[handle]
+			for handle in people_order if handle in self.person_contributions
+		}
+		self.family_contributions = {
+			handle: self.family_contributions[handle]
+			for handle in family_order if handle in self.family_contributions
+		}
+		self._bucket_contributions()
+		print(f"Finished collecting events; {len(affected_days)} days affected.")
+		return affected_days
+
+	@staticmethod
+	def _set_contribution(contributions, handle, collected):
+		"""Replaces or drops a handle's contribution."""
+		if collected:
+			contributions[handle] = collected
+		else:
+			contributions.pop(handle, None)
 
-			# Only consider family events if both partners are deceased.
-			# If one or both are unknown, we don't include it in this specific
-			# "deceased individuals only" report.
-			if father_gid in self.deceased_person_gids and \
-			mother_gid in self.deceased_person_gids:
-				for ref in family.get_event_ref_list():
-					event = self.db.get_event_from_handle(ref.ref)
-					e_date = event.get_date_object()
-
-					if not e_date.is_valid():
-						continue
-
-					if e_date.get_calendar() != Date.CAL_GREGORIAN:
-						e_date = e_date.to_calendar('gregorian')
+	def _manifest_path(self, output_dir):
+		return os.path.join(output_dir, 'manifest.json')
 
-					e_day = e_date.get_day()
-					e_month = e_date.get_month()
+	def _read_manifest(self, output_dir):
+		"""The manifest in output_dir as saved, or None if it can't be read."""
+		try:
+			with open(self._manifest_path(output_dir), encoding='utf-8') as f:
+				manifest = json.load(f)
+		except (OSError, ValueError):
+			return None
+		return manifest if isinstance(manifest, dict) else None
 
-					if e_day and e_month:
-						event_data = self._get_family_event_data(
-							family, event, e_date
-						)
-						if event_data:
-							day_key = (e_month, e_day)
-							self.events_by_day[day_key].append(event_data)
+	def load_manifest(self, output_dir):
+		"""
+		Loads the manifest left by a previous run into output_dir. Returns
+		None when there is no usable manifest and a full run is needed.
+		"""
+		manifest = self._read_manifest(output_dir)
+		if manifest is None:
+			return None
+		if manifest.get('version') != 3 or \
+		manifest.get('db_path') != os.path.abspath(self.db_path):
+			return None
+		if not hasattr(self.db, 'dbapi'):
+			print("Database backend has no change query; doing a full run.")
+			return None
+		for key in ('people', 'families'):
+			manifest[key] = {
+				handle: [
+					((month, day), EventRecord(*fields))
+					for month, day, fields in collected
+				]
+				for handle, collected in manifest[key].items()
+			}
+		return manifest
 
-		print("Finished collecting events.")
+	def save_manifest(self, output_dir, started, locales=(None,), export=None):
+		"""
+		Records which day each person and family contributed to, with the
+		records themselves, so the next run only re-extracts what changed,
+		and which languages and export options (see _export_options) were
+		written.
+		"""
+		header = json.dumps({
+			'version': 3,
+			'db_path': os.path.abspath(self.db_path),
+			'last_run': started,
+			'locales': list(locales),
+			'export': export,
+		}, ensure_ascii=False)
+		# Written a handle at a time, so the whole manifest is never held
+		# in memory as one string. The result is what json.dumps() of the
+		# complete manifest would give.
+		with atomic_writer(self._manifest_path(output_dir)) as f:
+			f.write(header[:-1].encode('utf-8'))
+			for key, contributions in (
+				('people', self.person_contributions),
+				('families', self.family_contributions),
+			):
+				f.write(f', "{key}": {{'.encode('utf-8'))
+				separator = ''
+				for handle, collected in contributions.items():
+					entry = json.dumps(
+						[[month, day, data] for (month, day), data in collected],
+						ensure_ascii=False, default=EventRecord.to_list,
+					)
+					f.write(f'{separator}{json.dumps(handle)}: {entry}'.encode('utf-8'))
+					separator = ', '
+				f.write(b'}')
+			f.write(b'}')
+			size = f.tell()
+		self._count_written(size)
+
+	def _count_written(self, size):
+		if self.counters is not None:
+			self.counters['files_written'] += 1
+			self.counters['bytes_written'] += size
+
+	def write_report(self, report_path):
+		"""
+		Writes the phase timings, counters and place cache statistics of
+		this run as JSON.
+		"""
+		report = {
+			'db_path': os.path.abspath(self.db_path),
+			'backend': type(self.backend).__name__,
+			'timings': {
+				phase: round(seconds, 4) for phase, seconds in self.timings.items()
+			},
+			'counters': dict(sorted((self.counters or {}).items())),
+			'place_cache': {
+				'hits': self.place_names.hits,
+				'misses': self.place_names.misses,
+				'size': self.place_cache_size,
+			},
+			'records': self.record_count(),
+		}
+		if self.watch_stats is not None:
+			report['watch'] = self.watch_stats
+		with open(report_path, 'w', encoding='utf-8') as f:
+			json.dump(report, f, indent=2)
+		print(f"Wrote run report to {report_path}")
 
-	def format_event_message(self, event_data):
+	def format_event_message(self, event_data, formatter=None):
 		"""Formats a single event into a human-readable string."""
-		e_str = event_data['event_type'].lower()
-		year = event_data['year']
-		place = event_data['place']
-		name = event_data['name']
-		gender = event_data['gender']
-		extra_info = event_data['extra_info']
-
-		# Handle marriage events with specific relationship types
-		if e_str == 'marriage':
-			e_str = e_str + str(extra_info)
-
-		# Default to male message if gender is unknown or not applicable
-		msg_template = None
-		if gender == Person.FEMALE:
-			msg_template = self.__EVENT_MESSAGE.get(e_str, {}).get('female')
-		if not msg_template:  # Fallback to male if female not found or default
-			msg_template = self.__EVENT_MESSAGE.get(e_str, {}).get('male')
-
-		if not msg_template:
-			# Fallback if no specific message template exists
-			return _(
-				f"{name} experienced a {event_data['event_type']} event "
-				f"in {year} at {place}."
+		return (formatter or self.formatter).format(event_data)
+
+	def _export_records(self, day_key, formatter):
+		"""Formats one day's events into the records published for it."""
+		output_list = []
+		for event in self.events_by_day.get(day_key, []):
+			formatted_desc = formatter.format(event)
+			output_list.append({
+				'person_name': event.name,
+				'gramps_id': event.gramps_id,
+				'event_type': event.event_type,
+				'year': formatter.year(event),
+				'place': formatter.place(event),
+				'description': formatted_desc,
+				'handle_type': formatter.handle_types[event.handle_type],
+				# Add handle for direct link if website supports it
+				'handle': str(event.handle),
+			})
+		if self.counters is not None:
+			self.counters['template_renders'] += len(output_list)
+		return output_list
+
+	# Columns of the columnar layout that repeat a lot and are stored as
+	# indexes into the file's string table.
+	_SHARED_STRING_COLUMNS = ('person_name', 'event_type', 'place', 'handle_type')
+
+	@classmethod
+	def _columnar(cls, output_list):
+		"""
+		Turns a day's records into one list per field. Names, places and
+		types are stored once in 'strings' and referenced by index.
+		"""
+		strings = []
+		string_index = {}
+		columns = {key: [] for key in output_list[0]}
+		for record in output_list:
+			for key, value in record.items():
+				if key in cls._SHARED_STRING_COLUMNS:
+					index = string_index.get(value)
+					if index is None:
+						index = string_index[value] = len(strings)
+						strings.append(value)
+					value = index
+				columns[key].append(value)
+		return {'strings': strings, **columns}
+
+	@staticmethod
+	def _dumps(data, style):
+		if style == 'minified':
+			text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+		else:
+			text = json.dumps(data, ensure_ascii=False, indent=2)
+		return text.encode('utf-8')
+
+	@staticmethod
+	def _compressors(compress):
+		"""Returns (extension, function) for each requested compression."""
+		compressors = []
+		if 'gz' in compress:
+			# mtime=0 keeps the bytes identical for identical content
+			compressors.append(
+				('.gz', lambda payload: gzip.compress(payload, 9, mtime=0))
 			)
+		if 'br' in compress:
+			try:
+				import brotli
+			except ImportError:
+				print("brotli is not installed; skipping .br files.")
+			else:
+				compressors.append(
+					('.br', lambda payload: brotli.compress(payload, quality=11))
+				)
+		return compressors
+
+	def _write_output(self, output_dir, filename, data, options, summary):
+		"""
+		Writes data as JSON to filename, plus any compressed siblings, or
+		removes them all if data is empty.
+		"""
+		self._write_payload(
+			output_dir, filename,
+			self._dumps(data, options['style']) if data else None,
+			len(data) if data else 0, options, summary,
+		)
 
-		# Use the appropriate placeholder for the name
-		if gender == Person.FEMALE and '%(female_name)s' in msg_template:
-			formatted_message = msg_template % {
-				'female_name': name,
-				'year': year,
-				'place': place,
-			}
+	def _write_payload(self, output_dir, filename, payload, entries, options, summary):
+		"""
+		Writes already serialized JSON bytes to filename, plus any
+		compressed siblings, or removes them all if payload is None.
+		"""
+		files = [(filename, None)] + [
+			(filename + ext, compressor)
+			for ext, compressor in options['compressors']
+		]
+		if payload is not None:
+			for name, compressor in files:
+				content = compressor(payload) if compressor else payload
+				if write_if_changed(os.path.join(output_dir, name), content):
+					summary['written'] += 1
+					self._count_written(len(content))
+					if compressor is None:
+						print(f"  Wrote {name} with {entries} entries.")
+				else:
+					summary['unchanged'] += 1
 		else:
-			formatted_message = msg_template % {
-				'male_name': name,
-				'year': year,
-				'place': place,
-			}
-		return formatted_message
+			for name, _compressor in files:
+				filepath = os.path.join(output_dir, name)
+				if os.path.exists(filepath):
+					os.remove(filepath)
+					summary['deleted'] += 1
+					print(f"  Removed {name}, it no longer has events.")
+
+	# Days covered by each sliding-window layout, starting at the file's day
+	_WINDOW_DAYS = {'week': 7, 'upcoming': 30}
+	# Anniversaries are published when the years since the event are a
+	# multiple of this
+	_ANNIVERSARY_STEP = 50
+
+	@classmethod
+	def _day_fragment(cls, day_key, records, style):
+		"""
+		Serializes one day's records as a '"MM-DD": [...]' member of the
+		"days" object of a window file, so each day is dumped only once
+		however many windows it appears in.
+		"""
+		key = json.dumps(f"{day_key[0]:02d}-{day_key[1]:02d}").encode('utf-8')
+		if style == 'minified':
+			return key + b':' + cls._dumps(records, style)
+		# Nested two levels deep in the pretty file
+		return b'    ' + key + b': ' + cls._dumps(records, style).replace(b'\n', b'\n    ')
+
+	@classmethod
+	def _window_payload(cls, fields, fragments, style):
+		"""
+		Builds the JSON bytes of {**fields, "days": {...}} from day
+		fragments, the same bytes json.dumps would write.
+		"""
+		head = cls._dumps(fields, style)
+		if style == 'minified':
+			return head[:-1] + b',"days":{' + b','.join(fragments) + b'}}'
+		return head[:-2] + b',\n  "days": {\n' + b',\n'.join(fragments) + b'\n  }\n}'
 
-	def export_daily_events_for_website(self, output_dir="daily_events"):
+	def _export_windows(self, output_dir, fragments, layouts, options, summary):
+		"""
+		Writes the LAYOUT_MM_DD.json file of every day for each sliding-window
+		layout, from fragments, a dict of (month, day) -> (fragment, entry
+		count) of the days with events. The window slides over the year one
+		day at a time, wrapping at the new year, with each day with events
+		entering and leaving it once, so no day is rendered or serialized
+		again per window it is in.
+		"""
+		for layout in layouts:
+			length = self._WINDOW_DAYS[layout]
+			window = deque()
+			entries = 0
+			for position in range(length - 1):
+				if DAYS[position] in fragments:
+					window.append((position, *fragments[DAYS[position]]))
+					entries += window[-1][2]
+			for start, (month, day) in enumerate(DAYS):
+				end = start + length - 1
+				last = DAYS[end % len(DAYS)]
+				if last in fragments:
+					window.append((end, *fragments[last]))
+					entries += window[-1][2]
+				payload = None
+				if window:
+					payload = self._window_payload(
+						{'from': f"{month:02d}-{day:02d}",
+						 'to': f"{last[0]:02d}-{last[1]:02d}"},
+						[fragment for _position, fragment, _count in window],
+						options['style'],
+					)
+				self._write_payload(
+					output_dir, f"{layout}_{month:02d}_{day:02d}.json",
+					payload, entries, options, summary,
+				)
+				if window and window[0][0] == start:
+					entries -= window.popleft()[2]
+
+	def _export_anniversaries(self, output_dir, fragments, year, options, summary):
+		"""
+		Writes anniversaries_YYYY.json with the events of year's round
+		anniversaries, from fragments as for _export_windows, and removes
+		the files of other years.
+		"""
+		filename = f"anniversaries_{year}.json"
+		self._write_payload(
+			output_dir, filename,
+			self._window_payload(
+				{'year': year},
+				[fragments[day][0] for day in DAYS if day in fragments],
+				options['style'],
+			) if fragments else None,
+			sum(count for _fragment, count in fragments.values()),
+			options, summary,
+		)
+		for name in sorted(os.listdir(output_dir)):
+			if not name.startswith('anniversaries_'):
+				continue
+			stem, json_ext, ext = name[len('anniversaries_'):].partition('.json')
+			if (
+				json_ext and stem.isdigit() and int(stem) != year
+				and ext in ('', '.gz', '.br')
+			):
+				os.remove(os.path.join(output_dir, name))
+				summary['deleted'] += 1
+				print(f"  Removed {name}, it is for another year.")
+
+	def export_daily_events_for_website(
+		self, output_dir="daily_events", days=None, style='pretty',
+		layouts=('day',), compress=(), formatter=None,
+	):
 		"""
 		Exports the collected daily events into a format suitable for a website.
-		Creates a JSON file for each day.
+		Files whose content did not change are left alone, so their mtime
+		does not change either, and files for days that no longer have events
+		are removed. If days is given, only those (month, day) keys and their
+		months are looked at.
+
+		style is 'pretty' (indented) or 'minified' JSON. layouts picks which
+		files are written:
+		  'day'      - events_MM_DD.json, a list of records per day
+		  'columnar' - columns_MM_DD.json, one list per field, with names,
+		               places and types in a string table
+		  'month'    - events_MM.json, the day records of a whole month
+		               keyed by two-digit day
+		  'index'    - events.idx, every day's records in one file with
+		               a table of where each day starts, for eventindex.py
+		  'week'     - week_MM_DD.json, the records of the 7 days starting
+		               that day as {"from", "to", "days": {"MM-DD": [...]}}
+		  'upcoming' - upcoming_MM_DD.json, the same for 30 days
+		  'anniversaries' - anniversaries_YYYY.json, the events that have
+		               a 50th, 100th, ... anniversary this year, keyed by
+		               day like the window files, each record with an
+		               added 'anniversary' (the number of years)
+		Windows run over the days of a leap year, Feb 29 included, and
+		wrap at the new year; days without events are left out of them.
+		compress adds precompressed 'gz' and/or 'br' siblings of each file.
+		formatter is the MessageFormatter of the language to write in,
+		by default that of the current locale.
+
+		Returns the number of files written, left unchanged and deleted.
 		"""
-		import os
-		import json
-
 		os.makedirs(output_dir, exist_ok=True)
 		print(f"\nExporting daily events to {output_dir}/")
+		summary = {'written': 0, 'unchanged': 0, 'deleted': 0}
+		options = {'style': style, 'compressors': self._compressors(compress)}
+		formatter = formatter or self.formatter
+		# The index, windows and anniversaries draw on every day, so they
+		# need them all even when only a few changed
+		windows = [layout for layout in self._WINDOW_DAYS if layout in layouts]
+		whole_year = 'index' in layouts or 'anniversaries' in layouts or bool(windows)
+		index_payloads = {}
+		window_fragments = {}
+		anniversary_fragments = {}
+		this_year = date.today().year
 
 		for month in range(1, 13):
+			if (
+				days is not None and not whole_year
+				and month not in {m for m, _d in days}
+			):
+				continue
+			month_records = {}
 			for day in range(1, 32):  # Iterate through all possible days
 				try:
 					# Validate day for the month (e.g., Feb 30 is invalid)
@@ -598,42 +2376,713 @@ class ThisDayInFamilyHistoryGenerator:
 					continue  # Skip invalid dates
 
 				day_key = (month, day)
-				events_for_day = self.events_by_day.get(day_key, [])
-
-				output_list = []
-				for event in events_for_day:
-					formatted_desc = self.format_event_message(event)
-					output_list.append({
-						'person_name': event['name'],
-						'gramps_id': event['gramps_id'],
-						'event_type': event['event_type'],
-						'year': event['year'],
-						'place': event['place'],
-						'description': formatted_desc,
-						'handle_type': event['handle_type'],
-						# Add handle for direct link if website supports it
-						'handle': str(event['handle']),
-					})
-
-				if output_list: # Only create files for days with events
-					filename = f"events_{month:02d}_{day:02d}.json"
-					filepath = os.path.join(output_dir, filename)
-					with open(filepath, 'w', encoding='utf-8') as f:
-						json.dump(output_list, f, ensure_ascii=False, indent=2)
-					print(f"  Created {filename} with {len(output_list)} events.")
+				day_touched = days is None or day_key in days
+				if not day_touched and 'month' not in layouts and not whole_year:
+					continue
+				output_list = self._export_records(day_key, formatter)
+				if output_list:
+					month_records[f"{day:02d}"] = output_list
+					if 'index' in layouts:
+						index_payloads[day_key] = self._dumps(output_list, 'minified')
+					if windows:
+						window_fragments[day_key] = (
+							self._day_fragment(day_key, output_list, style),
+							len(output_list),
+						)
+					if 'anniversaries' in layouts:
+						anniversaries = []
+						for event, record in zip(self.events_by_day.get(day_key, ()), output_list):
+							years = this_year - (event.year or this_year)
+							if years > 0 and years % self._ANNIVERSARY_STEP == 0:
+								anniversaries.append({**record, 'anniversary': years})
+						if anniversaries:
+							anniversary_fragments[day_key] = (
+								self._day_fragment(day_key, anniversaries, style),
+								len(anniversaries),
+							)
+				if not day_touched:
+					continue
+
+				# Only files for days with events are kept
+				if 'day' in layouts:
+					self._write_output(
+						output_dir, f"events_{month:02d}_{day:02d}.json",
+						output_list, options, summary,
+					)
+				if 'columnar' in layouts:
+					self._write_output(
+						output_dir, f"columns_{month:02d}_{day:02d}.json",
+						self._columnar(output_list) if output_list else None,
+						options, summary,
+					)
 				# else:
 				#     print(f"  No events for {month:02d}/{day:02d}.")
 
-		print("Export complete.")
+			if 'month' in layouts and (
+				days is None or month in {m for m, _d in days}
+			):
+				self._write_output(
+					output_dir, f"events_{month:02d}.json",
+					month_records, options, summary,
+				)
+
+		if windows:
+			self._export_windows(output_dir, window_fragments, windows, options, summary)
+		if 'anniversaries' in layouts:
+			self._export_anniversaries(
+				output_dir, anniversary_fragments, this_year, options, summary,
+			)
 
-	def run(self, output_dir="daily_events"):
+		if 'index' in layouts:
+			# Not compressed: readers memory-map it and slice out a day
+			payload = pack_index(index_payloads)
+			if write_if_changed(os.path.join(output_dir, 'events.idx'), payload):
+				summary['written'] += 1
+				self._count_written(len(payload))
+				print(f"  Wrote events.idx with {len(index_payloads)} days.")
+			else:
+				summary['unchanged'] += 1
+
+		print(
+			f"Export complete: {summary['written']} written, "
+			f"{summary['unchanged']} unchanged, {summary['deleted']} deleted."
+		)
+		return summary
+
+	def run(
+		self, output_dir="daily_events", full=False, workers=1,
+		style='pretty', layouts=('day',), compress=(), report_path=None,
+		locales=None, stream=False, spill_dir=None, keep_open=False,
+		resume=False, checkpoint_every=300.0,
+	):
+		"""
+		Extracts the events, incrementally if output_dir has a manifest,
+		and exports them. With locales, a list of language codes, the
+		files of each language are written to output_dir/<code>/ from the
+		same extraction; otherwise they are written to output_dir in the
+		current locale. stream makes a full run keep its records in a
+		temporary database in spill_dir (default: the system temporary
+		directory) rather than in memory. keep_open leaves the database
+		open for watch().
+
+		Serial and streaming full runs save a checkpoint to output_dir
+		every checkpoint_every seconds (0 for never); resume continues from
+		the one an interrupted run left, if the database has not changed.
+		"""
 		# self.connect_db()
-		self.generate_events_for_deceased()
-		self.export_daily_events_for_website(output_dir)
-		self.close_db()
+		started = int(time.time())
+		checkpoint = None
+		if checkpoint_every and not isinstance(self.backend, XmlBackend) and \
+				(stream or workers <= 1):
+			checkpoint = Checkpoint(output_dir, self._db_version(), checkpoint_every)
+			if resume and checkpoint.load():
+				print(f"Resuming from {checkpoint.path}.")
+				full = True
+			else:
+				if resume:
+					print("No checkpoint of the database as it is now; not resuming.")
+				elif os.path.exists(checkpoint.path):
+					print("Discarding the checkpoint of an interrupted run.")
+				checkpoint.discard()
+		manifest = None if full else self.load_manifest(output_dir)
+		export = self._export_options(style, layouts, compress)
+		# Full runs too: they only write the files of the current options
+		previous = manifest or self._read_manifest(output_dir)
+		if previous and previous.get('export') and previous['export'] != export:
+			for locale in previous.get('locales') or [None]:
+				self._remove_dropped_files(
+					output_dir if locale is None else os.path.join(output_dir, locale),
+					previous['export'], export,
+				)
+		exported = []
+		if manifest:
+			checkpoint = None
+			exported = manifest['locales']
+			if manifest.get('export') != export:
+				# Only the changed days would be written otherwise
+				print("The export options changed since the last run; exporting every day.")
+				exported = []
+		days = None
+		spill = None
+		try:
+			if manifest:
+				with self._timed('update'):
+					days = self.update_events_for_deceased(manifest)
+			elif stream:
+				spill = SpillStore(spill_dir)
+				self.generate_events_streaming(spill, checkpoint)
+			elif workers > 1 and not isinstance(self.backend, XmlBackend):
+				self.generate_events_for_deceased_parallel(workers)
+			else:
+				if workers > 1:
+					print("A .gramps file is read in a single pass; ignoring --workers.")
+				self.generate_events_for_deceased(checkpoint)
+			self.last_run = started
+			self._export_locales(
+				output_dir, days, locales or [None], exported,
+				style=style, layouts=layouts, compress=compress,
+			)
+			if checkpoint is not None:
+				checkpoint.discard()
+			self.place_names.report()
+			if report_path:
+				self.write_report(report_path)
+		finally:
+			# Also after a failure, so no spill file is left behind
+			if spill is not None:
+				spill.close()
+		if not keep_open:
+			self.close_db()
+
+	def _export_locales(self, output_dir, days, locales, exported, **options):
+		"""
+		Exports days (None for all) in each of locales and saves the
+		manifest. Languages not in exported, those written last time, get
+		every day. Returns the export summaries added up.
+		"""
+		totals = Counter()
+		with self._timed('export'):
+			for locale in locales:
+				if locale is None:
+					locale_dir, formatter = output_dir, self.formatter
+				else:
+					locale_dir = os.path.join(output_dir, locale)
+					formatter = MessageFormatter.for_locale(locale)
+				totals.update(self.export_daily_events_for_website(
+					locale_dir,
+					days if locale in exported else None,
+					formatter=formatter, **options,
+				))
+			self.save_manifest(
+				output_dir, self.last_run, locales, self._export_options(**options),
+			)
+		return totals
+
+	@staticmethod
+	def _export_options(style, layouts, compress):
+		"""The export options as saved in the manifest."""
+		return {
+			'style': style,
+			'layouts': sorted(set(layouts)),
+			'compress': sorted(set(compress)),
+		}
+
+	# The files each layout writes, without compression extensions
+	_LAYOUT_FILES = {
+		'day': re.compile(r'events_\d\d_\d\d\.json'),
+		'columnar': re.compile(r'columns_\d\d_\d\d\.json'),
+		'month': re.compile(r'events_\d\d\.json'),
+		'index': re.compile(r'events\.idx'),
+		'week': re.compile(r'week_\d\d_\d\d\.json'),
+		'upcoming': re.compile(r'upcoming_\d\d_\d\d\.json'),
+		'anniversaries': re.compile(r'anniversaries_\d+\.json'),
+	}
+
+	def _remove_dropped_files(self, output_dir, previous, current):
+		"""
+		Removes from output_dir the files of the layouts and compressions
+		that the previous run's export options had and current does not.
+		"""
+		dropped_layouts = set(previous['layouts']) - set(current['layouts'])
+		dropped_compress = set(previous['compress']) - set(current['compress'])
+		if not (dropped_layouts or dropped_compress) or not os.path.isdir(output_dir):
+			return
+		for name in sorted(os.listdir(output_dir)):
+			base, ext = os.path.splitext(name)
+			compression = ext[1:] if ext in ('.gz', '.br') else None
+			if compression is None:
+				base = name
+			layout = next(
+				(layout for layout, pattern in self._LAYOUT_FILES.items()
+				 if pattern.fullmatch(base)),
+				None,
+			)
+			if layout is None:
+				continue
+			if layout in dropped_layouts or compression in dropped_compress:
+				os.remove(os.path.join(output_dir, name))
+				print(f"  Removed {name}, its layout or compression is no longer written.")
+
+	def _db_version(self):
+		"""
+		Identifies the state of the database, to tell whether a checkpoint
+		was taken from it: the number of objects and the latest change of
+		each table the extraction reads.
+		"""
+		version = [os.path.abspath(self.db_path)]
+		if hasattr(self.db, 'dbapi'):
+			for table in ('person', 'family', 'event', 'place'):
+				self.db.dbapi.execute(f"SELECT COUNT(*), MAX(change) FROM {table}")
+				version.append(list(self.db.dbapi.fetchone()))
+		else:
+			stat = os.stat(self.db_path)
+			version.append([stat.st_mtime_ns, stat.st_size])
+		return version
+
+	def _db_signature(self):
+		"""
+		Changes whenever Gramps writes to the database folder. The lock
+		file only says the tree is open somewhere.
+		"""
+		signature = []
+		with os.scandir(self.db_path) as entries:
+			for entry in entries:
+				if entry.name != 'lock' and entry.is_file():
+					stat = entry.stat()
+					signature.append((entry.name, stat.st_mtime_ns, stat.st_size))
+		return sorted(signature)
+
+	def watch(
+		self, output_dir="daily_events", locales=None, style='pretty',
+		layouts=('day',), compress=(), report_path=None, poll_interval=1.0,
+		debounce=5.0, max_delay=60.0,
+	):
+		"""
+		Keeps the database, person summaries and place cache from run()
+		and, whenever the database folder is written to, regenerates the
+		days that changed once the writes have paused for debounce seconds,
+		or max_delay seconds after the first one if they do not. Runs until
+		interrupted or sent SIGTERM. The counters in watch_stats are
+		printed after every regeneration and written with the report to
+		report_path.
+		"""
+		# Stop cleanly as a service too
+		signal.signal(signal.SIGTERM, signal.default_int_handler)
+		locales = locales or [None]
+		self._export_all_days = False
+		self.watch_stats = {
+			'runs': 0, 'failures': 0, 'files_written': 0, 'files_deleted': 0,
+			'last_latency': None, 'max_latency': 0.0, 'total_latency': 0.0,
+		}
+		signature = self._db_signature()
+		print(
+			f"\nWatching {self.db_path} for changes "
+			f"(every {poll_interval:g}s, debounce {debounce:g}s)..."
+		)
+		try:
+			while True:
+				time.sleep(poll_interval)
+				current = self._db_signature()
+				if current == signature:
+					continue
+				# Timed from the newest write seen, close to when the edit
+				# was saved
+				first_change = max(
+					(stamp for _name, stamp, _size in current), default=0
+				) / 1e9
+				first_seen = last_change = time.time()
+				while (
+					time.time() - last_change < debounce
+					and time.time() - first_seen < max_delay
+				):
+					time.sleep(poll_interval)
+					newer = self._db_signature()
+					if newer != current:
+						current, last_change = newer, time.time()
+				try:
+					self._regenerate(
+						output_dir, locales, min(first_change, first_seen),
+						report_path, style=style, layouts=layouts, compress=compress,
+					)
+				except Exception as e:
+					# Such as "database is locked" while Gramps saves; the
+					# signature is left as it was, so the next poll retries
+					self.watch_stats['failures'] += 1
+					print(
+						f"Regeneration failed, retrying: {type(e).__name__}: {e}"
+					)
+					continue
+				signature = current
+		except KeyboardInterrupt:
+			print("Stopped watching.")
+		finally:
+			self.place_names.report()
+			self.close_db()
+
+	def _regenerate(self, output_dir, locales, first_change, report_path, **options):
+		"""
+		One round of watch(): re-extracts and exports what changed. If it
+		fails, the next round starts from the same point in time.
+		"""
+		since = self.last_run
+		self.last_run = int(time.time())
+		try:
+			with self._timed('update'):
+				days = self.update_events_for_deceased({
+					'last_run': since,
+					'people': self.person_contributions,
+					'families': self.family_contributions,
+				})
+			totals = self._export_locales(
+				output_dir, None if self._export_all_days else days,
+				locales, locales, **options,
+			)
+		except Exception:
+			# Contributions already replaced no longer tell which days
+			# their old records were on, so the retry exports them all
+			self.last_run = since
+			self._export_all_days = True
+			raise
+		self._export_all_days = False
+
+		latency = time.time() - first_change
+		stats = self.watch_stats
+		stats['runs'] += 1
+		stats['files_written'] += totals['written']
+		stats['files_deleted'] += totals['deleted']
+		stats['last_latency'] = round(latency, 3)
+		stats['max_latency'] = round(max(stats['max_latency'], latency), 3)
+		stats['total_latency'] = round(stats['total_latency'] + latency, 3)
+		print(
+			f"Regeneration {stats['runs']}: {len(days)} days, "
+			f"{totals['written']} files written, {totals['deleted']} deleted, "
+			f"{latency:.1f}s after the change "
+			f"(mean {stats['total_latency'] / stats['runs']:.1f}s, "
+			f"max {stats['max_latency']:.1f}s)."
+		)
+		if report_path:
+			self.write_report(report_path)
+
+
+# Per-process state for the parallel passes
+_worker = None
+
+
+def _init_worker(db_path, place_cache_size, backend, instrument, deceased=None):
+	global _worker
+	_worker = ThisDayInFamilyHistoryGenerator(
+		db_path, place_cache_size, backend, db=open_database_readonly(db_path),
+		instrument=instrument,
+	)
+	if deceased is not None:
+		_worker.person_summaries = deceased
+		_worker.all_people_summarized = True
+
+
+def _extract_people_shard(handles):
+	return _worker._extract_people(handles)
+
+
+def _extract_families_shard(handles):
+	return _worker._extract_families(handles)
+
+
+def read_batch_file(batch_path):
+	"""
+	Reads the trees of a batch run: one "<db path> <output dir>" per line,
+	shell-quoted if they contain spaces. Blank lines and # comments are
+	skipped.
+	"""
+	jobs = []
+	with open(batch_path, encoding='utf-8') as f:
+		for line_number, line in enumerate(f, 1):
+			fields = shlex.split(line, comments=True)
+			if not fields:
+				continue
+			if len(fields) != 2:
+				raise ValueError(
+					f"{batch_path}:{line_number}: expected a database path "
+					"and an output directory"
+				)
+			jobs.append(tuple(fields))
+	return jobs
+
+
+def _run_tree(db_path, output_dir, options):
+	"""
+	Runs one tree of a batch, headless, and returns its statistics and the
+	output it printed, which would otherwise interleave with other trees.
+	"""
+	log = io.StringIO()
+	started = time.perf_counter()
+	stats = {'db_path': db_path, 'output_dir': output_dir, 'error': None}
+	try:
+		with redirect_stdout(log):
+			generator = ThisDayInFamilyHistoryGenerator(
+				db_path, place_cache_size=options['place_cache_size'],
+				# A file rather than a database folder is a .gramps export
+				backend='xml' if os.path.isfile(db_path) else options['backend'],
+				headless=True,
+			)
+			# Streaming and incremental runs do not index every event
+			count_events = getattr(generator.db, 'get_number_of_events', None)
+			events = count_events() if count_events else None
+			generator.run(
+				output_dir, full=options['full'], style=options['style'],
+				layouts=options['layouts'], compress=options['compress'],
+				locales=options['locales'], stream=options['stream'],
+				spill_dir=options['spill_dir'],
+			)
+		if events is None:
+			# A .gramps file has no count; it counts them as it reads them
+			events = getattr(generator.db, 'events_read', None)
+		stats['events'] = events
+		stats['records'] = generator.record_count()
+	except Exception as e:
+		stats['error'] = f"{type(e).__name__}: {e}"
+	stats['seconds'] = time.perf_counter() - started
+	return stats, log.getvalue()
+
+
+def run_batch(jobs, workers, options):
+	"""
+	Runs several trees, up to workers at a time. Gramps is imported once,
+	here; worker processes are forked from this one and inherit it, and
+	open their tree directly instead of through the CLI manager. Prints
+	each tree's output as it finishes and a throughput table at the end.
+	Returns the number of trees that failed.
+	"""
+	if not jobs:
+		print("The batch file lists no trees.")
+		return 0
+	started = time.perf_counter()
+	results = []
+	if workers > 1:
+		with ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+			futures = {
+				pool.submit(_run_tree, db_path, output_dir, options): position
+				for position, (db_path, output_dir) in enumerate(jobs)
+			}
+			finished = {}
+			for future in as_completed(futures):
+				finished[futures[future]] = future.result()
+				_print_tree_log(*finished[futures[future]])
+		# The table lists the trees in the order of the batch file
+		results = [finished[position] for position in range(len(jobs))]
+	else:
+		for db_path, output_dir in jobs:
+			results.append(_run_tree(db_path, output_dir, options))
+			_print_tree_log(*results[-1])
+	elapsed = time.perf_counter() - started
+
+	print(f"\n{'tree':<40} {'seconds':>8} {'events':>9} {'events/s':>9} {'records':>8}")
+	for stats, _log in results:
+		if stats['error']:
+			print(f"{stats['db_path']:<40} {stats['seconds']:>8.2f}  failed: {stats['error']}")
+			continue
+		if stats['events'] is None:
+			events = rate = '?'
+		else:
+			events = stats['events']
+			rate = f"{events / stats['seconds'] if stats['seconds'] else 0:.0f}"
+		print(
+			f"{stats['db_path']:<40} {stats['seconds']:>8.2f} "
+			f"{events:>9} {rate:>9} {stats['records']:>8}"
+		)
+	print(
+		f"{len(jobs)} trees in {elapsed:.2f}s with {workers} workers "
+		f"({len(jobs) / elapsed * 60:.1f} trees/minute)."
+	)
+	return sum(1 for stats, _log in results if stats['error'])
+
+
+def _print_tree_log(stats, log):
+	print(f"\n=== {stats['db_path']} -> {stats['output_dir']} ===")
+	print(log, end='')
+	if stats['error']:
+		print(f"Failed: {stats['error']}")
 
 
 if __name__ == "__main__":
+	import argparse
+
+	parser = argparse.ArgumentParser(
+		description="Precompute 'this day in family history' JSON files."
+	)
+	parser.add_argument(
+		'gramps_path', nargs='?',
+		help="path to the Gramps source tree (optional with --xml)",
+	)
+	parser.add_argument(
+		'db_path', nargs='?',
+		help="path to the Gramps database folder (not needed with --xml or "
+		"--batch)",
+	)
+	parser.add_argument(
+		'--xml', metavar='FILE',
+		help="read a Gramps XML export (.gramps) instead of a database; "
+		"this does not need Gramps",
+	)
+	parser.add_argument(
+		'--batch', metavar='FILE',
+		help="process several trees listed in FILE, one \"<db path> <output "
+		"dir>\" per line, importing Gramps once and opening each tree "
+		"headless",
+	)
+	parser.add_argument(
+		'--batch-workers', type=int, default=1,
+		help="number of trees to process at the same time with --batch "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--output-dir', default="daily_events",
+		help="where to write the day files (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--full', action='store_true',
+		help="ignore the manifest from the last run and rebuild every day",
+	)
+	parser.add_argument(
+		'--headless', action='store_true',
+		help="open the database read-only without registering Gramps "
+		"plugins or going through the CLI manager",
+	)
+	parser.add_argument(
+		'--backend', choices=['objects', 'raw', 'sql'], default='objects',
+		help="read the database through Gramps objects, straight from "
+		"the SQLite JSON columns, or from those with the event filters "
+		"done in SQL (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--workers', type=int, default=1,
+		help="number of processes to extract a full run with "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--json-style', choices=['pretty', 'minified'], default='pretty',
+		help="indent the JSON files or strip all whitespace "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--layout', action='append',
+		choices=['day', 'columnar', 'month', 'index', 'week', 'upcoming', 'anniversaries'],
+		help="which files to write; repeat for several (default: day). "
+		"day: events_MM_DD.json, columnar: columns_MM_DD.json with a string "
+		"table, month: events_MM.json with a whole month, index: events.idx "
+		"with every day, for eventindex.py, week/upcoming: week_MM_DD.json/"
+		"upcoming_MM_DD.json with the 7/30 days from that day, "
+		"anniversaries: anniversaries_YYYY.json with this year's 50th, "
+		"100th, ... anniversaries",
+	)
+	parser.add_argument(
+		'--compress', action='append', choices=['gz', 'br'], default=[],
+		help="also write precompressed .gz and/or .br (needs the brotli "
+		"package) copies of every file",
+	)
+	parser.add_argument(
+		'--locales', type=lambda value: value.split(','),
+		help="comma-separated language codes, e.g. en,de,fr: write the files "
+		"of each language to <output-dir>/<code>/ from a single extraction",
+	)
+	parser.add_argument(
+		'--stream', action='store_true',
+		help="on full runs, keep the collected events in a temporary "
+		"database instead of memory, so memory use stays flat on very "
+		"large trees (slower; ignores --workers)",
+	)
+	parser.add_argument(
+		'--spill-dir', metavar='DIR',
+		help="where --stream keeps its temporary database (default: the "
+		"system temporary directory)",
+	)
+	parser.add_argument(
+		'--resume', action='store_true',
+		help="continue the full run that was interrupted, from the "
+		"checkpoint it left in the output folder",
+	)
+	parser.add_argument(
+		'--checkpoint-every', type=float, default=300.0, metavar='SECONDS',
+		help="on full runs without --workers, save progress for --resume "
+		"this often; 0 turns it off (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--watch', action='store_true',
+		help="after the run, keep running and regenerate the changed days "
+		"whenever the database is written to; opens the database "
+		"read-only, as --headless does, so Gramps can edit it meanwhile",
+	)
+	parser.add_argument(
+		'--poll-interval', type=float, default=1.0,
+		help="with --watch, seconds between checks of the database folder "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--debounce', type=float, default=5.0,
+		help="with --watch, seconds without writes to wait for before "
+		"regenerating (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--max-delay', type=float, default=60.0,
+		help="with --watch, regenerate at the latest this many seconds "
+		"after the first write, even if writes continue "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--place-cache-size', type=int, default=4096,
+		help="number of place names to keep cached (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--report', metavar='PATH',
+		help="count database calls, date conversions, rendered descriptions "
+		"and bytes written, and write them with the phase timings to PATH "
+		"as JSON",
+	)
+	parser.add_argument(
+		'--profile', metavar='PATH',
+		help="run under cProfile and dump the stats to PATH, for pstats or "
+		"snakeviz",
+	)
+	args = parser.parse_args()
+	sources = [args.db_path, args.xml, args.batch]
+	if sum(source is not None for source in sources) != 1:
+		parser.error("give one of a database path, --xml or --batch")
+	if not GRAMPS_AVAILABLE and (args.db_path or args.locales):
+		parser.error(
+			"reading a database and --locales need Gramps; give the path to "
+			"its source tree first"
+		)
+
+	if args.watch and (args.xml or args.batch or args.stream or args.workers > 1):
+		parser.error("--watch needs a database path and no --stream or --workers")
+	if args.watch:
+		# The CLI manager opens the tree for writing and locks it for as
+		# long as we watch, which would keep Gramps from editing it
+		args.headless = True
+	if args.resume and (
+		args.xml or args.batch or (args.workers > 1 and not args.stream)
+	):
+		parser.error("--resume needs a database path and no --workers")
+	if args.batch and (args.report or args.profile):
+		parser.error("--report and --profile take one tree, not --batch")
+
+	if args.batch:
+		failed = run_batch(read_batch_file(args.batch), args.batch_workers, {
+			'place_cache_size': args.place_cache_size, 'backend': args.backend,
+			'full': args.full, 'style': args.json_style,
+			'layouts': args.layout or ['day'], 'compress': args.compress,
+			'locales': args.locales, 'stream': args.stream,
+			'spill_dir': args.spill_dir,
+		})
+		sys.exit(1 if failed else 0)
+
+	if args.profile:
+		import cProfile
+		profiler = cProfile.Profile()
+		profiler.enable()
+
+	generator = ThisDayInFamilyHistoryGenerator(
+		args.xml or args.db_path, place_cache_size=args.place_cache_size,
+		backend='xml' if args.xml else args.backend, headless=args.headless,
+		instrument=bool(args.report),
+	)
+	generator.run(
+		args.output_dir, full=args.full, workers=args.workers,
+		style=args.json_style, layouts=args.layout or ['day'],
+		compress=args.compress, report_path=args.report,
+		locales=args.locales, stream=args.stream, spill_dir=args.spill_dir,
+		keep_open=args.watch, resume=args.resume,
+		checkpoint_every=args.checkpoint_every,
+	)
+
+	if args.watch:
+		generator.watch(
+			args.output_dir, locales=args.locales, style=args.json_style,
+			layouts=args.layout or ['day'], compress=args.compress,
+			report_path=args.report, poll_interval=args.poll_interval,
+			debounce=args.debounce, max_delay=args.max_delay,
+		)
 
-	generator = ThisDayInFamilyHistoryGenerator(sys.argv[2])
-	generator.run()
\ No newline at end of file
+	if args.profile:
+		profiler.disable()
+		profiler.dump_stats(args.profile)
+		print(f"Wrote profile to {args.profile}")
\ No newline at end of file
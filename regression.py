@@ -0,0 +1,874 @@
+"""
+Checks that a change to the generator writes the same files, no slower.
+
+Runs a reference pipeline and a candidate pipeline, each a revision of this
+repository plus onthisday.py options, on the same fixture databases in fresh
+processes. The day files they write are compared day by day: the records of
+each day, with key order and whitespace ignored, and the order of those
+records, which is part of the published output. The wall time and peak
+memory of each run are compared against thresholds. Exits with status 1 if
+the output differs or either regressed. With --incremental, the candidate's
+output is that of an incremental run after part of the tree was touched.
+With --xml, the candidate reads an XML export of each fixture and the
+reference the database imported from it.
+
+The fixtures are a small hand-made tree of edge cases (every calendar, leap
+days, partial and text-only dates, missing places, one-parent and
+half-deceased families, custom event types and the like) with handles in
+random order, the Gramps example tree, whose handles are not in the order
+its rows were written either, and a synthetic tree from benchmark.py. They
+are built once and kept in --cache-dir.
+
+usage: uv run regression.py <path to gramps source> [--reference HEAD]
+       [--candidate .] [--candidate-args "--backend sql"]
+"""
+import sys
+import os
+import json
+import time
+import shlex
+import shutil
+import random
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+
+# Puts Gramps on sys.path from sys.argv[1], like running onthisday.py does
+from benchmark import synthetic_tree
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Bump when make_edge_tree changes, so cached copies are rebuilt
+EDGE_TREE_VERSION = 2
+# Differences this small are noise on the small fixtures, whatever the
+# percentage
+TIME_SLACK_SECONDS = 0.25
+MEMORY_SLACK_KB = 8 * 1024
+# Differing records shown per day
+SHOWN_DIFFERENCES = 3
+
+
+def make_edge_tree(db_path):
+	"""
+	Writes a small SQLite Gramps database of the cases the generator has
+	rules for, so a fast path that gets one of them wrong changes the
+	output. Returns the object counts.
+	"""
+	from gramps.gen.db import DbTxn
+	from gramps.gen.db.dbconst import DBBACKEND
+	from gramps.gen.lib import (
+		Date, Event, EventRef, EventRoleType, EventType, Family, FamilyRelType,
+		Name, Person, Place, PlaceName, PlaceRef, Surname,
+	)
+	from gramps.plugins.db.dbapi.sqlite import SQLite
+
+	os.makedirs(db_path)
+	with open(os.path.join(db_path, DBBACKEND), 'w', encoding='utf-8') as f:
+		f.write('sqlite\n')
+	with open(os.path.join(db_path, 'name.txt'), 'w', encoding='utf-8') as f:
+		f.write('Regression edge cases\n')
+
+	db = SQLite()
+	db.load(db_path)
+	counts = Counter()
+	# Handles in random order, unlike the time-ordered ones Gramps makes,
+	# so handle order and the order rows were written in differ
+	rng = random.Random(EDGE_TREE_VERSION)
+
+	def new_handle():
+		return f"{rng.getrandbits(80):020X}"
+
+	def make_date(value, calendar=Date.CAL_GREGORIAN, modifier=Date.MOD_NONE,
+			quality=Date.QUAL_NONE):
+		date = Date()
+		date.set(quality, modifier, calendar, value)
+		return date
+
+	def text_date(text):
+		date = Date()
+		date.set_as_text(text)
+		return date
+
+	with DbTxn("Regression edge cases", db) as trans:
+		places = {}
+		for key, name, enclosed_by in (
+			('county', 'Rutland', None),
+			('town', 'Oakham', 'county'),
+			('umlaut', 'Großenhain', None),
+			('unnamed', '', None),
+		):
+			place = Place()
+			place.set_handle(new_handle())
+			place_name = PlaceName()
+			place_name.set_value(name)
+			place.set_name(place_name)
+			if enclosed_by:
+				place_ref = PlaceRef()
+				place_ref.set_reference_handle(places[enclosed_by])
+				place.add_placeref(place_ref)
+			db.add_place(place, trans)
+			places[key] = place.handle
+			counts['places'] += 1
+
+		def add_event(holder, event_type, date=None, place=None,
+				role=EventRoleType.PRIMARY, event=None):
+			if event is None:
+				event = Event()
+				event.set_handle(new_handle())
+				event.set_type(event_type)
+				if date is not None:
+					event.set_date_object(date)
+				if place:
+					event.set_place_handle(places[place])
+				db.add_event(event, trans)
+				counts['events'] += 1
+			ref = EventRef()
+			ref.set_reference_handle(event.handle)
+			ref.set_role(EventRoleType(role))
+			holder.add_event_ref(ref)
+			return event
+
+		def add_person(first, surname, gender, events, prefix=''):
+			"""events are (type, date, place) triples."""
+			person = Person()
+			person.set_handle(new_handle())
+			person.set_gender(gender)
+			name = Name()
+			name.set_first_name(first)
+			if surname:
+				name_surname = Surname()
+				name_surname.set_surname(surname)
+				name_surname.set_prefix(prefix)
+				name.add_surname(name_surname)
+			person.set_primary_name(name)
+			for event_type, date, place in events:
+				add_event(person, event_type, date, place)
+			db.add_person(person, trans)
+			counts['people'] += 1
+			return person
+
+		def add_family(father, mother, events, relationship=FamilyRelType.MARRIED):
+			family = Family()
+			family.set_handle(new_handle())
+			family.set_relationship(FamilyRelType(relationship))
+			for partner, set_handle in (
+				(father, family.set_father_handle),
+				(mother, family.set_mother_handle),
+			):
+				if isinstance(partner, str):
+					set_handle(partner)  # a person that does not exist
+				elif partner is not None:
+					set_handle(partner.handle)
+			for event_type, date, place in events:
+				add_event(family, event_type, date, place)
+			db.add_family(family, trans)
+			counts['families'] += 1
+			for partner in (father, mother):
+				if isinstance(partner, Person):
+					partner.add_family_handle(family.handle)
+					db.commit_person(partner, trans)
+			return family
+
+		death = (EventType.DEATH, make_date((3, 3, 1890, False)), 'town')
+		male, female, unknown = Person.MALE, Person.FEMALE, Person.UNKNOWN
+
+		# One birth per calendar, of people who have died
+		for first, value, calendar in (
+			('Gregor', (14, 7, 1789, False), Date.CAL_GREGORIAN),
+			# Dec 25 1700 Julian is Jan 5 1701 Gregorian
+			('Julius', (25, 12, 1700, False), Date.CAL_JULIAN),
+			('Hanna', (15, 7, 5600, False), Date.CAL_HEBREW),
+			('Floréal', (1, 9, 8, False), Date.CAL_FRENCH),
+			('Kourosh', (1, 1, 1300, False), Date.CAL_PERSIAN),
+			('Fatima', (12, 3, 1300, False), Date.CAL_ISLAMIC),
+			('Sven', (28, 2, 1708, False), Date.CAL_SWEDISH),
+		):
+			add_person(first, 'Calendar', male, [
+				(EventType.BIRTH, make_date(value, calendar), 'town'), death,
+			])
+		# Leap days: a Gregorian Feb 29, and a Julian one that does not
+		# exist in the Gregorian calendar
+		add_person('Leap', 'Day', female, [
+			(EventType.BIRTH, make_date((29, 2, 1804, False)), 'umlaut'),
+			(EventType.DEATH, make_date((29, 2, 1700, False), Date.CAL_JULIAN), None),
+		])
+		# Partial, qualified, ranged and text-only dates
+		add_person('Partial', 'Dates', female, [
+			(EventType.BIRTH, make_date((0, 5, 1820, False)), 'town'),
+			(EventType.BAPTISM, make_date((0, 0, 1820, False)), 'town'),
+			(EventType.ADULT_CHRISTEN, make_date((6, 6, 0, False)), 'town'),
+			(EventType.DEATH, make_date((7, 8, 1880, False), modifier=Date.MOD_ABOUT), None),
+			(EventType.BURIAL, make_date(
+				(9, 8, 1880, False, 12, 8, 1880, False), modifier=Date.MOD_RANGE
+			), 'county'),
+		])
+		add_person('Vague', 'Dates', male, [
+			(EventType.BIRTH, make_date((1, 2, 1830, False), modifier=Date.MOD_BEFORE), None),
+			(EventType.GRADUATION, make_date((1, 2, 1850, False), modifier=Date.MOD_AFTER), None),
+			(EventType.EMIGRATION, make_date(
+				(1, 4, 1855, False, 1, 5, 1856, False), modifier=Date.MOD_SPAN
+			), None),
+			(EventType.IMMIGRATION, make_date(
+				(20, 6, 1856, False), quality=Date.QUAL_ESTIMATED
+			), 'unnamed'),
+			(EventType.DEATH, text_date("after the flood"), None),
+		])
+		# Deceased by burial or cremation only, or by a death without a date
+		add_person('Buried', 'Only', female, [
+			(EventType.BIRTH, make_date((10, 10, 1810, False)), None),
+			(EventType.BURIAL, make_date((11, 11, 1870, False)), 'county'),
+		])
+		add_person('Cremated', 'Only', male, [
+			(EventType.BIRTH, make_date((12, 12, 1912, False)), None),
+			(EventType.CREMATION, make_date((13, 1, 1990, False)), None),
+		])
+		add_person('Undated', 'Death', unknown, [
+			(EventType.BIRTH, make_date((14, 2, 1850, False)), 'town'),
+			(EventType.DEATH, None, None),
+		])
+		# Living: nothing of theirs is reported
+		living = add_person('Still', 'Living', female, [
+			(EventType.BIRTH, make_date((15, 3, 1950, False)), 'town'),
+			(EventType.RESIDENCE, make_date((16, 4, 1980, False)), 'town'),
+		])
+		# Custom types, one spelled like a standard type, and types that
+		# are never reported
+		add_person('Custom', 'Types', male, [
+			(EventType((EventType.CUSTOM, 'Knighted')), make_date((17, 5, 1700, False)), None),
+			(EventType((EventType.CUSTOM, 'death')), make_date((18, 6, 1760, False)), None),
+			(EventType.CENSUS, make_date((19, 7, 1741, False)), 'town'),
+			(EventType.OCCUPATION, make_date((20, 8, 1742, False)), None),
+		])
+		# Names: none at all, a prefix, no surname
+		add_person('', '', unknown, [
+			(EventType.BIRTH, make_date((21, 9, 1801, False)), None), death,
+		])
+		add_person('Pieter', 'Berg', male, [
+			(EventType.BIRTH, make_date((22, 10, 1802, False)), 'umlaut'), death,
+		], prefix='van den')
+		add_person('Madonna', '', female, [
+			(EventType.BIRTH, make_date((23, 11, 1803, False)), None), death,
+		])
+		# An event shared by two people, one of them only as a witness
+		shared = Event()
+		shared.set_handle(new_handle())
+		shared.set_type(EventType.ELECTED)
+		shared.set_date_object(make_date((24, 12, 1804, False)))
+		db.add_event(shared, trans)
+		counts['events'] += 1
+		for first in ('Twin', 'Witness'):
+			person = add_person(first, 'Shared', male, [death])
+			add_event(
+				person, None, event=shared,
+				role=EventRoleType.PRIMARY if first == 'Twin' else EventRoleType.WITNESS,
+			)
+			db.commit_person(person, trans)
+		# An event nobody refers to
+		orphan = Event()
+		orphan.set_handle(new_handle())
+		orphan.set_type(EventType.BIRTH)
+		orphan.set_date_object(make_date((25, 1, 1805, False)))
+		db.add_event(orphan, trans)
+		counts['events'] += 1
+
+		# Families: only those with both partners deceased are reported
+		def partner(first, surname, gender, deceased=True):
+			events = [(EventType.BIRTH, make_date((2, 2, 1790, False)), None)]
+			return add_person(first, surname, gender, events + ([death] if deceased else []))
+
+		marriage = (EventType.MARRIAGE, make_date((26, 6, 1815, False)), 'town')
+		add_family(partner('Both', 'Husband', male), partner('Both', 'Wife', female), [
+			marriage,
+			(EventType.ENGAGEMENT, make_date((1, 1, 1815, False), Date.CAL_JULIAN), None),
+			(EventType.DIVORCE, make_date((0, 3, 1830, False)), None),
+			(EventType.RESIDENCE, make_date((5, 5, 1820, False)), 'county'),
+		])
+		add_family(partner('Half', 'Husband', male), partner('Half', 'Wife', female, deceased=False), [marriage])
+		add_family(partner('Lone', 'Father', male), None, [marriage])
+		add_family(None, partner('Lone', 'Mother', female), [marriage])
+		add_family(None, None, [marriage])
+		add_family(partner('Dangling', 'Husband', male), 'no-such-person', [marriage])
+		add_family(partner('Same', 'Husband', male), partner('Same', 'Partner', male), [
+			(EventType.MARRIAGE, make_date((27, 7, 1850, False)), None),
+		], FamilyRelType.CIVIL_UNION)
+		add_family(partner('Unmarried', 'Husband', male), partner('Unmarried', 'Wife', female), [
+			(EventType.MARR_BANNS, make_date((28, 8, 1840, False)), 'umlaut'),
+		], FamilyRelType.UNMARRIED)
+		add_family(partner('Living', 'Widower', male), living, [marriage])
+	db.close()
+	return dict(counts)
+
+
+def edge_tree(cache_dir):
+	"""
+	Returns the path and object counts of the cached edge case tree,
+	building it first if needed.
+	"""
+	db_path = os.path.join(cache_dir, 'regression_edge')
+	info_path = os.path.join(db_path, 'fixture.json')
+	if os.path.exists(info_path):
+		with open(info_path, encoding='utf-8') as f:
+			info = json.load(f)
+		if info.get('version') == EDGE_TREE_VERSION:
+			return db_path, info
+
+	print(f"Building the edge case tree in {db_path}...")
+	shutil.rmtree(db_path, ignore_errors=True)
+	info = {'version': EDGE_TREE_VERSION, **make_edge_tree(db_path)}
+	# Written last, so a half-built tree is rebuilt next time
+	with open(info_path, 'w', encoding='utf-8') as f:
+		json.dump(info, f, indent=2)
+	return db_path, info
+
+
+def find_example(gramps_path):
+	"""
+	Returns the path of the Gramps example tree, in a source tree or an
+	installed Gramps' documentation, or None if there is none.
+	"""
+	for path in (
+		os.path.join(gramps_path, 'example', 'gramps', 'example.gramps'),
+		os.path.join(sys.prefix, 'share', 'doc', 'gramps', 'example', 'gramps', 'example.gramps'),
+	):
+		if os.path.exists(path):
+			return path
+	return None
+
+
+def import_xml(xml_path, db_path, name):
+	"""
+	Imports a Gramps XML file into a new SQLite database at db_path, as
+	Gramps does, and returns its object counts.
+	"""
+	from gramps.gen.db.dbconst import DBBACKEND
+	from gramps.gen.user import User
+	from gramps.plugins.db.dbapi.sqlite import SQLite
+	from gramps.plugins.importer.importxml import importData
+
+	print(f"Importing {xml_path} into {db_path}...")
+	shutil.rmtree(db_path, ignore_errors=True)
+	os.makedirs(db_path)
+	with open(os.path.join(db_path, DBBACKEND), 'w', encoding='utf-8') as f:
+		f.write('sqlite\n')
+	with open(os.path.join(db_path, 'name.txt'), 'w', encoding='utf-8') as f:
+		f.write(f"{name}\n")
+	db = SQLite()
+	db.load(db_path)
+	importData(db, xml_path, User())
+	counts = {
+		'people': db.get_number_of_people(),
+		'families': db.get_number_of_families(),
+		'events': db.get_number_of_events(),
+		'places': db.get_number_of_places(),
+	}
+	db.close()
+	return counts
+
+
+def example_tree(cache_dir, example_path):
+	"""
+	Returns the path and object counts of the Gramps example tree imported
+	into a SQLite database, importing it first if needed.
+	"""
+	db_path = os.path.join(cache_dir, 'regression_example')
+	info_path = os.path.join(db_path, 'fixture.json')
+	if os.path.exists(info_path):
+		with open(info_path, encoding='utf-8') as f:
+			info = json.load(f)
+		if info.get('source') == os.path.abspath(example_path):
+			return db_path, info
+
+	info = {'source': os.path.abspath(example_path)}
+	info.update(import_xml(example_path, db_path, 'Gramps example tree'))
+	with open(info_path, 'w', encoding='utf-8') as f:
+		json.dump(info, f, indent=2)
+	return db_path, info
+
+
+def xml_fixture(db_path, counts):
+	"""
+	Returns the paths of a Gramps XML export of the fixture at db_path and
+	of a database imported from that export, making both first if needed.
+	Gramps exports objects in handle order, so it is the imported database,
+	not the fixture, that --xml should write the same files as.
+	"""
+	from gramps.gen.db.dbconst import DBMODE_R
+	from gramps.gen.user import User
+	from gramps.plugins.db.dbapi.sqlite import SQLite
+	from gramps.plugins.export.exportxml import export_data
+
+	xml_dir = db_path + '_xml'
+	export_path = os.path.join(xml_dir, 'export.gramps')
+	imported_path = os.path.join(xml_dir, 'db')
+	info_path = os.path.join(xml_dir, 'fixture.json')
+	source = {'source': os.path.abspath(db_path), 'fixture': counts}
+	if os.path.exists(info_path):
+		with open(info_path, encoding='utf-8') as f:
+			if json.load(f) == source:
+				return export_path, imported_path
+
+	print(f"Exporting {db_path} to {export_path}...")
+	shutil.rmtree(xml_dir, ignore_errors=True)
+	os.makedirs(xml_dir)
+	db = SQLite()
+	db.load(db_path, mode=DBMODE_R)
+	if not export_data(db, export_path, User()):
+		raise RuntimeError(f"exporting {db_path} to {export_path} failed")
+	db.close()
+	import_xml(export_path, imported_path, f"{os.path.basename(db_path)} export")
+	with open(info_path, 'w', encoding='utf-8') as f:
+		json.dump(source, f, indent=2)
+	return export_path, imported_path
+
+
+def touch_tree(db_path, every=7):
+	"""
+	Marks every so many people and families of a fixture copy as changed
+	without changing them, so an incremental run re-extracts them and
+	should write exactly what a full run does.
+	"""
+	connection = sqlite3.connect(os.path.join(db_path, 'sqlite.db'))
+	with connection:
+		for table in ('person', 'family'):
+			connection.execute(
+				f"UPDATE {table} SET change = ? WHERE rowid % ? = 0",
+				[int(time.time()) + 1, every],
+			)
+	connection.close()
+
+
+def checkout(revision, work_dir):
+	"""
+	Returns a directory with onthisday.py as of revision, '.' being the
+	working tree.
+	"""
+	if revision == '.':
+		return script_dir
+	tree = os.path.join(work_dir, 'tree-' + revision.replace('/', '_'))
+	if not os.path.exists(tree):
+		os.makedirs(tree)
+		archive = subprocess.run(
+			['git', 'archive', '--format=tar', revision], cwd=script_dir,
+			capture_output=True, check=True,
+		).stdout
+		subprocess.run(['tar', '-x', '-C', tree], input=archive, check=True)
+	return tree
+
+
+# Runs a script as __main__ and, as it exits, writes its peak RSS in KiB
+# to a file, the way benchmark.py's peak_rss_kb measures it. ru_maxrss from
+# wait4 would not do: a forked child starts with its parent's peak, and
+# this process has built or imported the fixtures by then. Imports nothing
+# but the standard library, so it adds little of its own.
+_MEASURED_RUN = """
+import os, sys, atexit, runpy, resource
+
+peak_path, script = sys.argv[1], sys.argv[2]
+
+def write_peak():
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	try:
+		with open('/proc/self/status', encoding='ascii') as f:
+			for line in f:
+				if line.startswith('VmHWM:'):
+					peak = int(line.split()[1])
+	except OSError:
+		pass
+	children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+	with open(peak_path, 'w', encoding='ascii') as f:
+		f.write(str(max(peak, children)))
+
+atexit.register(write_peak)
+sys.argv = sys.argv[2:]
+sys.path[0] = os.path.dirname(os.path.abspath(script))
+runpy.run_path(script, run_name='__main__')
+"""
+
+
+def run_pipeline(
+	tree, gramps_path, db_path, options, output_dir, log_path, xml=False,
+):
+	"""
+	Runs onthisday.py from tree on db_path, or with xml on the .gramps file
+	db_path, in a fresh process and returns its wall time in seconds and
+	peak RSS in KiB, that of its workers included.
+	"""
+	peak_path = log_path + '.peak'
+	source = ['--xml', db_path] if xml else [db_path, '--headless']
+	command = [
+		os.path.join(tree, 'onthisday.py'), gramps_path,
+	] + source + ['--output-dir', output_dir] + options
+	with open(log_path, 'w', encoding='utf-8') as log:
+		started = time.perf_counter()
+		process = subprocess.run(
+			[sys.executable, '-c', _MEASURED_RUN, peak_path] + command,
+			cwd=os.path.dirname(output_dir), stdout=log,
+			stderr=subprocess.STDOUT,
+		)
+		wall = time.perf_counter() - started
+	if process.returncode:
+		raise RuntimeError(
+			f"{' '.join(map(shlex.quote, [sys.executable] + command))} failed with status "
+			f"{process.returncode}; see {log_path}"
+		)
+	with open(peak_path, encoding='ascii') as f:
+		return wall, int(f.read())
+
+
+def _read(path):
+	"""The bytes of a file, or b'' if it was not written."""
+	try:
+		with open(path, 'rb') as f:
+			return f.read()
+	except FileNotFoundError:
+		return b''
+
+
+def _canonical_records(path):
+	"""A day file's records as a Counter of sorted-key JSON strings."""
+	with open(path, encoding='utf-8') as f:
+		records = json.load(f)
+	return Counter(
+		json.dumps(record, sort_keys=True, ensure_ascii=False)
+		for record in records
+	)
+
+
+def _output_files(output_dir):
+	"""
+	The files to compare: everything but the manifest, which holds
+	timestamps, and compressed siblings, which follow from their file.
+	"""
+	return {
+		name for name in os.listdir(output_dir)
+		if name != 'manifest.json' and not name.endswith(('.gz', '.br'))
+	}
+
+
+def _record_order(payload):
+	"""A day file's records in order, as sorted-key JSON strings."""
+	return [
+		json.dumps(record, sort_keys=True, ensure_ascii=False)
+		for record in json.loads(payload)
+	]
+
+
+def compare_outputs(reference_dir, candidate_dir, ignore_order=False):
+	"""
+	Compares two output directories. Day files are compared day by day,
+	first as multisets of records and then for the order of the records;
+	other files byte for byte, or as parsed JSON if they are JSON. Returns
+	(problems, notes), lists of lines to print; notes are differences of
+	formatting only, and of record order with ignore_order.
+	"""
+	problems = []
+	notes = []
+	reference_files = _output_files(reference_dir)
+	candidate_files = _output_files(candidate_dir)
+	reordered = 0
+	reformatted = 0
+	for name in sorted(reference_files | candidate_files):
+		reference_path = os.path.join(reference_dir, name)
+		candidate_path = os.path.join(candidate_dir, name)
+		is_day = name.startswith('events_') and name.count('_') == 2
+		if name not in candidate_files or name not in reference_files:
+			# A day file that only one side has is a day whose records
+			# all went missing or appeared
+			if not is_day:
+				side = 'reference' if name in reference_files else 'candidate'
+				problems.append(f"{name}: only written by the {side}")
+				continue
+		reference_bytes = _read(reference_path)
+		candidate_bytes = _read(candidate_path)
+		if reference_bytes == candidate_bytes:
+			continue
+		if is_day:
+			reference = _canonical_records(reference_path) if reference_bytes else Counter()
+			candidate = _canonical_records(candidate_path) if candidate_bytes else Counter()
+			day = name[len('events_'):-len('.json')].replace('_', '-')
+			if reference == candidate:
+				reference_order = _record_order(reference_bytes)
+				candidate_order = _record_order(candidate_bytes)
+				if reference_order == candidate_order:
+					reformatted += 1
+				elif ignore_order:
+					reordered += 1
+				else:
+					position = next(
+						position for position, (ours, theirs)
+						in enumerate(zip(reference_order, candidate_order))
+						if ours != theirs
+					)
+					problems.append(
+						f"{day}: same records in a different order, from "
+						f"record {position + 1}:"
+					)
+					for sign, order in (('-', reference_order), ('+', candidate_order)):
+						problems.append(
+							f"    {sign} {json.loads(order[position]).get('description', order[position])}"
+						)
+				continue
+			missing = reference - candidate
+			extra = candidate - reference
+			problems.append(
+				f"{day}: {sum(missing.values())} records missing, "
+				f"{sum(extra.values())} extra"
+			)
+			for sign, records in (('-', missing), ('+', extra)):
+				for record in sorted(records)[:SHOWN_DIFFERENCES]:
+					problems.append(f"    {sign} {json.loads(record)['description']}")
+		elif name.endswith('.json') and (
+			json.loads(reference_bytes) == json.loads(candidate_bytes)
+		):
+			notes.append(f"{name}: same JSON, different formatting")
+		else:
+			problems.append(f"{name}: contents differ")
+	if reordered:
+		notes.append(f"{reordered} day files have their records in another order")
+	if reformatted:
+		notes.append(f"{reformatted} day files differ only in formatting")
+	return problems, notes
+
+
+def regressions(reference, candidate, max_slowdown, max_memory_growth):
+	"""
+	Returns lines describing how candidate, a (wall seconds, peak KiB)
+	pair, is slower or bigger than reference past the thresholds, given
+	in percent.
+	"""
+	lines = []
+	wall_limit = reference[0] * (1 + max_slowdown / 100) + TIME_SLACK_SECONDS
+	if candidate[0] > wall_limit:
+		lines.append(
+			f"wall time {candidate[0]:.2f} s vs {reference[0]:.2f} s "
+			f"(+{(candidate[0] / reference[0] - 1) * 100:.0f}%, "
+			f"limit +{max_slowdown:g}%)"
+		)
+	memory_limit = reference[1] * (1 + max_memory_growth / 100) + MEMORY_SLACK_KB
+	if candidate[1] > memory_limit:
+		lines.append(
+			f"peak memory {candidate[1] / 1024:.1f} MB vs {reference[1] / 1024:.1f} MB "
+			f"(+{(candidate[1] / reference[1] - 1) * 100:.0f}%, "
+			f"limit +{max_memory_growth:g}%)"
+		)
+	return lines
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description="Compare the output, time and memory of two versions "
+		"of the generator on fixture databases."
+	)
+	parser.add_argument('gramps_path', help="path to the Gramps source tree")
+	parser.add_argument(
+		'--reference', default='HEAD',
+		help="git revision of the reference pipeline, '.' for the working "
+		"tree (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--candidate', default='.',
+		help="git revision of the candidate pipeline, '.' for the working "
+		"tree (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--reference-args', default='',
+		help="onthisday.py options for the reference run, e.g. "
+		"\"--backend objects\" (default: none)",
+	)
+	parser.add_argument(
+		'--candidate-args', default='',
+		help="onthisday.py options for the candidate run, e.g. "
+		"\"--backend sql --stream\" (default: none)",
+	)
+	parser.add_argument(
+		'--fixtures', nargs='+', choices=['edge', 'example', 'synthetic'],
+		default=['edge', 'example', 'synthetic'],
+		help="fixture databases to run on (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--example', metavar='FILE',
+		help="the Gramps example tree to import for the example fixture "
+		"(default: example/gramps/example.gramps of the Gramps source or "
+		"installation)",
+	)
+	parser.add_argument(
+		'--size', type=int, default=5000,
+		help="people in the synthetic fixture (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--seed', type=int, default=1,
+		help="seed for the synthetic fixture (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--repeat', type=int, default=3,
+		help="runs of each pipeline per fixture; the best time and memory "
+		"are compared (default: %(default)s)",
+	)
+	parser.add_argument(
+		'--max-slowdown', type=float, default=10,
+		help="percent the candidate may be slower before it fails "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--max-memory-growth', type=float, default=10,
+		help="percent the candidate's peak memory may grow before it fails "
+		"(default: %(default)s)",
+	)
+	parser.add_argument(
+		'--ignore-order', action='store_true',
+		help="only note days whose records are the same in another order, "
+		"instead of failing",
+	)
+	parser.add_argument(
+		'--xml', action='store_true',
+		help="run the candidate with --xml on a Gramps XML export of each "
+		"fixture, and the reference on the database imported from that "
+		"export",
+	)
+	parser.add_argument(
+		'--incremental', action='store_true',
+		help="compare the candidate's output after touching every 7th "
+		"person and family and running it again incrementally",
+	)
+	parser.add_argument(
+		'--cache-dir', default=os.path.join(script_dir, 'benchmark_dbs'),
+		help="where fixture databases are kept between runs "
+		"(default: %(default)s)",
+	)
+	# argparse would take a value such as "--stream" for an option of its
+	# own, so join the pipelines' options to their flag first
+	argv = []
+	for arg in sys.argv[1:]:
+		if argv and argv[-1] in ('--reference-args', '--candidate-args'):
+			argv[-1] += f"={arg}"
+		else:
+			argv.append(arg)
+	args = parser.parse_args(argv)
+	if args.xml and args.incremental:
+		parser.error("--xml runs are always full runs; leave out --incremental")
+
+	os.makedirs(args.cache_dir, exist_ok=True)
+	fixtures = []
+	for fixture in args.fixtures:
+		if fixture == 'edge':
+			fixtures.append(('edge',) + edge_tree(args.cache_dir))
+		elif fixture == 'example':
+			example_path = args.example or find_example(args.gramps_path)
+			if example_path is None:
+				parser.error(
+					"no example.gramps found; give it with --example or "
+					"leave out the example fixture"
+				)
+			fixtures.append(('example',) + example_tree(args.cache_dir, example_path))
+		else:
+			db_path, tree = synthetic_tree(args.cache_dir, args.size, args.seed)
+			fixtures.append((f"synthetic {args.size}", db_path, tree))
+	exports = {}
+	if args.xml:
+		try:
+			for fixture, db_path, counts in fixtures:
+				exports[fixture] = xml_fixture(db_path, counts)
+		except ImportError as e:
+			# The exporter module also loads Gramps' GTK option boxes
+			parser.error(f"--xml needs Gramps' XML exporter, which failed to load: {e}")
+
+	work_dir = tempfile.mkdtemp(prefix='onthisday-regression-')
+	failed = False
+	finished = False
+	try:
+		pipelines = [
+			('reference', checkout(args.reference, work_dir),
+			 shlex.split(args.reference_args)),
+			('candidate', checkout(args.candidate, work_dir),
+			 shlex.split(args.candidate_args)),
+		]
+		for name, revision, options in (
+			('reference', args.reference, args.reference_args),
+			('candidate', args.candidate, args.candidate_args),
+		):
+			print(f"{name}: {'working tree' if revision == '.' else revision} {options}")
+		if args.incremental:
+			print("The candidate's output is checked after an incremental run.")
+		if args.xml:
+			print(
+				"The candidate reads an XML export of each fixture, the "
+				"reference the database imported from it."
+			)
+		print(f"\n{'fixture':>16} {'pipeline':>9} {'wall s':>8} {'peak MB':>8}")
+		for fixture, db_path, _counts in fixtures:
+			sources = {'reference': db_path, 'candidate': db_path}
+			if args.xml:
+				export_path, imported_path = exports[fixture]
+				sources = {'reference': imported_path, 'candidate': export_path}
+			best = {}
+			outputs = {}
+			# Alternate the pipelines, so drift in the machine's load
+			# hits both alike
+			for repeat in range(args.repeat):
+				for name, tree, options in pipelines:
+					run_dir = os.path.join(work_dir, f"{fixture}-{name}-{repeat}")
+					os.makedirs(run_dir)
+					output_dir = os.path.join(run_dir, 'daily_events')
+					incremental = args.incremental and name == 'candidate' and repeat == 0
+					run_db = sources[name]
+					if incremental:
+						run_db = os.path.join(run_dir, 'db')
+						shutil.copytree(db_path, run_db)
+					measured = run_pipeline(
+						tree, args.gramps_path, run_db, options, output_dir,
+						os.path.join(run_dir, 'run.log'),
+						xml=args.xml and name == 'candidate',
+					)
+					if incremental:
+						touch_tree(run_db)
+						run_pipeline(
+							tree, args.gramps_path, run_db, options, output_dir,
+							os.path.join(run_dir, 'incremental.log'),
+						)
+					best[name] = tuple(
+						min(pair) for pair in zip(best.get(name, measured), measured)
+					)
+					if repeat == 0:
+						outputs[name] = output_dir
+					else:
+						shutil.rmtree(run_dir)
+			for name, _tree, _options in pipelines:
+				print(
+					f"{fixture:>16} {name:>9} {best[name][0]:>8.2f} "
+					f"{best[name][1] / 1024:>8.1f}"
+				)
+
+			problems, notes = compare_outputs(
+				outputs['reference'], outputs['candidate'], args.ignore_order,
+			)
+			for note in notes:
+				print(f"  note: {note}")
+			if problems:
+				print(f"  OUTPUT DIFFERS on {fixture}:")
+				for problem in problems:
+					print(f"  {problem}")
+			slower = regressions(
+				best['reference'], best['candidate'],
+				args.max_slowdown, args.max_memory_growth,
+			)
+			for line in slower:
+				print(f"  REGRESSION on {fixture}: {line}")
+			if problems or slower:
+				failed = True
+			else:
+				print(f"  {fixture}: same output, within limits")
+		finished = True
+	finally:
+		if failed or not finished:
+			print(f"\nOutputs and logs kept in {work_dir}")
+		else:
+			shutil.rmtree(work_dir, ignore_errors=True)
+	print("\nFAILED" if failed else "\nPASSED")
+	sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,415 @@
+"""
+Serves the exported day files over HTTP, from memory.
+
+GET /events?from=MM-DD&to=MM-DD returns the events of every day in the
+range (wrapping over the new year if to is before from) as
+{"from": ..., "to": ..., "days": {"MM-DD": [...], ...}}, so a week or month
+widget needs a single request. Responses carry an ETag and Last-Modified
+and are answered with 304 Not Modified when the client already has them.
+The files are reloaded when onthisday.py writes new output.
+
+If the directory has an events.idx (--layout index), it is read instead
+of the day files. This only reads the output; it does not need Gramps.
+
+usage: uv run serve.py [daily_events] [--port 8000]
+       uv run serve.py [daily_events] --load-test
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import http.client
+from collections import OrderedDict
+from datetime import date, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from eventindex import EventIndex
+
+
+# Every MM-DD of a leap year, in calendar order
+DAYS = [
+	(date(2000, 1, 1) + timedelta(days=offset)).strftime('%m-%d')
+	for offset in range(366)
+]
+DAY_POSITIONS = {day: position for position, day in enumerate(DAYS)}
+
+
+class DayIndex:
+	"""
+	The events of an output directory, loaded once. Each day is kept as
+	minified JSON with a hash of its content, so a range response is the
+	concatenation of its days and its ETag is a hash of their hashes.
+	"""
+
+	def __init__(self, output_dir, cache_size=1024):
+		self.output_dir = output_dir
+		self.loaded = time.time()
+		# 'MM-DD' -> (json bytes, sha1 digest, file mtime)
+		self.days = {}
+		self._responses = OrderedDict()
+		self._cache_size = cache_size
+		self._lock = threading.Lock()
+		if self._load_index():
+			return
+		for day in DAYS:
+			month, day_of_month = day.split('-')
+			path = os.path.join(output_dir, f"events_{month}_{day_of_month}.json")
+			try:
+				with open(path, 'rb') as f:
+					records = json.load(f)
+				mtime = os.stat(path).st_mtime
+			except FileNotFoundError:
+				continue
+			self._add_day(day, records, mtime)
+		if not self.days:
+			self._load_months()
+
+	def _manifest_header(self):
+		"""
+		The manifest's fields other than the records, which follow them,
+		or None if there is no manifest in the directory.
+		"""
+		try:
+			with open(os.path.join(self.output_dir, 'manifest.json'), 'rb') as f:
+				head = f.read(1 << 16)
+		except FileNotFoundError:
+			return None
+		end = head.find(b', "people": ')
+		try:
+			return json.loads(head[:end] + b'}') if end > 0 else None
+		except ValueError:
+			return None
+
+	def _index_is_current(self, path):
+		"""
+		Tells whether events.idx is up to date: the last run wrote the index
+		layout, and the index is at least as new as the JSON files next to
+		it. An unchanged index is not rewritten, so it can be older than the
+		manifest; only manifests that do not say which layouts were written
+		are compared by time. With no JSON files, the index is all there is.
+		"""
+		try:
+			index_mtime = os.stat(path).st_mtime_ns
+		except FileNotFoundError:
+			return False
+		others = []
+		with os.scandir(self.output_dir) as entries:
+			for entry in entries:
+				if entry.name.startswith('events_') and entry.name.endswith('.json'):
+					others.append(entry.stat().st_mtime_ns)
+		if not others:
+			return True
+		header = self._manifest_header()
+		if header and header.get('export'):
+			if 'index' not in header['export']['layouts']:
+				return False
+		elif header is not None:
+			others.append(
+				os.stat(os.path.join(self.output_dir, 'manifest.json')).st_mtime_ns
+			)
+		return index_mtime >= max(others)
+
+	def _load_index(self):
+		"""
+		Takes the days from events.idx, whose payloads are already minified,
+		unless it is older than the JSON files or cannot be read.
+		"""
+		path = os.path.join(self.output_dir, 'events.idx')
+		if not self._index_is_current(path):
+			return False
+		days = {}
+		try:
+			with EventIndex(path) as index:
+				mtime = os.stat(path).st_mtime
+				for day in DAYS:
+					month, day_of_month = day.split('-')
+					payload = index.raw(int(month), int(day_of_month))
+					if payload:
+						days[day] = (payload, hashlib.sha1(payload).digest(), mtime)
+		except (OSError, ValueError) as e:
+			print(f"Not using {path}: {e}")
+			return False
+		self.days = days
+		return True
+
+	def _load_months(self):
+		"""Falls back on the events_MM.json files of the month layout."""
+		for month in range(1, 13):
+			path = os.path.join(self.output_dir, f"events_{month:02d}.json")
+			try:
+				with open(path, 'rb') as f:
+					month_records = json.load(f)
+				mtime = os.stat(path).st_mtime
+			except FileNotFoundError:
+				continue
+			for day_of_month, records in month_records.items():
+				self._add_day(f"{month:02d}-{day_of_month}", records, mtime)
+
+	def _add_day(self, day, records, mtime):
+		payload = json.dumps(
+			records, ensure_ascii=False, separators=(',', ':')
+		).encode('utf-8')
+		self.days[day] = (payload, hashlib.sha1(payload).digest(), mtime)
+
+	@staticmethod
+	def signature(output_dir):
+		"""
+		Changes whenever onthisday.py writes to output_dir: files are
+		renamed into place, which touches the directory, and every run
+		rewrites the manifest.
+		"""
+		stamps = []
+		for path in (output_dir, os.path.join(output_dir, 'manifest.json')):
+			try:
+				stamps.append(os.stat(path).st_mtime_ns)
+			except FileNotFoundError:
+				stamps.append(None)
+		return tuple(stamps)
+
+	@staticmethod
+	def span(start, end):
+		"""The days from start to end inclusive, wrapping over the new year."""
+		first, last = DAY_POSITIONS[start], DAY_POSITIONS[end]
+		if last >= first:
+			return DAYS[first:last + 1]
+		return DAYS[first:] + DAYS[:last + 1]
+
+	def response(self, start, end):
+		"""Returns (body, etag, last modified) for a range, cached."""
+		key = (start, end)
+		with self._lock:
+			cached = self._responses.get(key)
+			if cached is not None:
+				self._responses.move_to_end(key)
+				return cached
+
+		digest = hashlib.sha1()
+		parts = []
+		last_modified = 0
+		for day in self.span(start, end):
+			entry = self.days.get(day)
+			if entry is None:
+				continue
+			payload, day_digest, mtime = entry
+			parts.append(b'"' + day.encode('ascii') + b'":' + payload)
+			# The same records on another day of the range are another body
+			digest.update(day.encode('ascii'))
+			digest.update(day_digest)
+			last_modified = max(last_modified, mtime)
+		body = (
+			b'{"from":"' + start.encode('ascii') + b'","to":"'
+			+ end.encode('ascii') + b'","days":{' + b','.join(parts) + b'}}'
+		)
+		digest.update(key[0].encode('ascii') + key[1].encode('ascii'))
+		cached = (body, f'"{digest.hexdigest()}"', int(last_modified or self.loaded))
+
+		with self._lock:
+			self._responses[key] = cached
+			if len(self._responses) > self._cache_size:
+				self._responses.popitem(last=False)
+		return cached
+
+
+class EventsServer(ThreadingHTTPServer):
+	"""HTTP server over a DayIndex that reloads it when the output changes."""
+
+	daemon_threads = True
+
+	def __init__(self, address, output_dir, poll_interval=1.0, verbose=False):
+		self.output_dir = output_dir
+		self.verbose = verbose
+		self.signature = DayIndex.signature(output_dir)
+		self.index = DayIndex(output_dir)
+		self.reloads = 0
+		super().__init__(address, EventsHandler)
+		self._poll_interval = poll_interval
+		threading.Thread(target=self._watch, daemon=True).start()
+
+	def _watch(self):
+		while True:
+			time.sleep(self._poll_interval)
+			signature = DayIndex.signature(self.output_dir)
+			if signature == self.signature:
+				continue
+			# Let the generator finish writing before reading
+			time.sleep(self._poll_interval)
+			self.signature = DayIndex.signature(self.output_dir)
+			# Requests keep using the old index until the new one is swapped in
+			try:
+				self.index = DayIndex(self.output_dir)
+			except (OSError, ValueError) as e:
+				print(f"Could not reload {self.output_dir}, keeping the old files: {e}")
+				continue
+			self.reloads += 1
+			print(f"Reloaded {len(self.index.days)} days from {self.output_dir}")
+
+
+class EventsHandler(BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+	# Headers and body are separate writes; without this, keep-alive
+	# clients wait out a delayed ACK on every response.
+	disable_nagle_algorithm = True
+
+	def do_GET(self):
+		url = urlsplit(self.path)
+		if url.path != '/events':
+			self._send_error(404, "not found")
+			return
+		query = parse_qs(url.query)
+		today = date.today().strftime('%m-%d')
+		start = query.get('from', [today])[0]
+		end = query.get('to', [start])[0]
+		if start not in DAY_POSITIONS or end not in DAY_POSITIONS:
+			self._send_error(400, "from and to must be MM-DD")
+			return
+
+		body, etag, last_modified = self.server.index.response(start, end)
+		if self._not_modified(etag, last_modified):
+			self.send_response(304)
+			self._send_cache_headers(etag, last_modified)
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+			return
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/json; charset=utf-8')
+		self._send_cache_headers(etag, last_modified)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def _not_modified(self, etag, last_modified):
+		# If-None-Match wins over If-Modified-Since when both are sent
+		if_none_match = self.headers.get('If-None-Match')
+		if if_none_match is not None:
+			return if_none_match.strip() == '*' or etag in [
+				tag.strip() for tag in if_none_match.split(',')
+			]
+		if_modified_since = self.headers.get('If-Modified-Since')
+		if if_modified_since:
+			try:
+				since = parsedate_to_datetime(if_modified_since)
+			except (TypeError, ValueError):
+				return False
+			if since.tzinfo is None:
+				since = since.replace(tzinfo=timezone.utc)
+			return last_modified <= since.timestamp()
+		return False
+
+	def _send_cache_headers(self, etag, last_modified):
+		self.send_header('ETag', etag)
+		self.send_header('Last-Modified', formatdate(last_modified, usegmt=True))
+		# Revalidate every time, so regenerated output shows up at once
+		self.send_header('Cache-Control', 'no-cache')
+
+	def _send_error(self, status, message):
+		body = json.dumps({'error': message}).encode('utf-8')
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json; charset=utf-8')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		if self.server.verbose:
+			super().log_message(format, *args)
+
+
+def load_test(server, requests=20000, clients=8):
+	"""
+	Hammers a running server with keep-alive GETs of random ranges from a
+	few client threads and prints throughput and latency percentiles.
+	"""
+	import random
+
+	host, port = server.server_address[:2]
+	per_client = requests // clients
+	latencies = []
+	lock = threading.Lock()
+
+	def client(seed):
+		rng = random.Random(seed)
+		connection = http.client.HTTPConnection(host, port)
+		timings = []
+		for _request in range(per_client):
+			start = rng.randrange(len(DAYS))
+			path = f"/events?from={DAYS[start]}&to={DAYS[(start + rng.randrange(31)) % len(DAYS)]}"
+			started = time.perf_counter()
+			connection.request('GET', path)
+			response = connection.getresponse()
+			response.read()
+			timings.append(time.perf_counter() - started)
+		connection.close()
+		with lock:
+			latencies.extend(timings)
+
+	threads = [
+		threading.Thread(target=client, args=(seed,)) for seed in range(clients)
+	]
+	started = time.perf_counter()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	elapsed = time.perf_counter() - started
+
+	latencies.sort()
+	def percentile(p):
+		return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+	print(
+		f"{len(latencies)} requests from {clients} clients in {elapsed:.2f}s: "
+		f"{len(latencies) / elapsed:.0f} req/s, p50 {percentile(0.5):.2f}ms, "
+		f"p99 {percentile(0.99):.2f}ms, max {latencies[-1] * 1000:.2f}ms"
+	)
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description="Serve the exported day files over HTTP from memory."
+	)
+	parser.add_argument(
+		'output_dir', nargs='?', default="daily_events",
+		help="directory onthisday.py writes to (default: %(default)s)",
+	)
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8000)
+	parser.add_argument(
+		'--poll-interval', type=float, default=1.0,
+		help="seconds between checks for new output (default: %(default)s)",
+	)
+	parser.add_argument('--verbose', action='store_true', help="log every request")
+	parser.add_argument(
+		'--load-test', action='store_true',
+		help="start on a free port, run a local load test against it and exit",
+	)
+	args = parser.parse_args()
+
+	if not os.path.isdir(args.output_dir):
+		print(f"Error: {args.output_dir} does not exist; run onthisday.py first.")
+		sys.exit(1)
+
+	port = 0 if args.load_test else args.port
+	server = EventsServer(
+		(args.host, port), args.output_dir, args.poll_interval, args.verbose
+	)
+	print(f"Loaded {len(server.index.days)} days from {args.output_dir}")
+	if args.load_test:
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		load_test(server)
+		server.shutdown()
+		return
+
+	host, port = server.server_address[:2]
+	print(f"Serving on http://{host}:{port}/events?from=MM-DD&to=MM-DD")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+
+
+if __name__ == "__main__":
+	main()